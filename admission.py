@@ -0,0 +1,54 @@
+"""Control de admisión para las rutas pesadas (carga, generación y descarga de ZIP).
+
+Cada clase de trabajo tiene un cupo global de peticiones simultáneas y un cupo por
+cliente. Si no hay cupo la petición se rechaza de inmediato (429 con Retry-After) en lugar
+de encolarse y competir por CPU y memoria. El estado es del proceso: con varios procesos
+de servidor cada uno aplica sus propios cupos.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class AdmissionRejected(Exception):
+    """No hay cupo para la petición"""
+
+    def __init__(self, mensaje, retry_after):
+        super().__init__(mensaje)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, global_limits, per_client_limit, retry_after=5):
+        # global_limits: {clase: máximo de peticiones simultáneas en el proceso}
+        self.global_limits = global_limits
+        self.per_client_limit = per_client_limit
+        self.retry_after = retry_after
+        self._activas = defaultdict(int)
+        self._por_cliente = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def admit(self, clase, cliente):
+        """Ocupa un cupo de la clase durante el bloque; lanza AdmissionRejected si no hay"""
+        with self._lock:
+            if self._por_cliente[(clase, cliente)] >= self.per_client_limit:
+                raise AdmissionRejected('Ya tiene una solicitud de este tipo en curso', self.retry_after)
+            if self._activas[clase] >= self.global_limits[clase]:
+                raise AdmissionRejected('El servidor está ocupado con otras solicitudes', self.retry_after)
+            self._activas[clase] += 1
+            self._por_cliente[(clase, cliente)] += 1
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._activas[clase] -= 1
+                self._por_cliente[(clase, cliente)] -= 1
+                if not self._por_cliente[(clase, cliente)]:
+                    del self._por_cliente[(clase, cliente)]
+
+    def in_flight(self):
+        """Peticiones en curso por clase"""
+        with self._lock:
+            return dict(self._activas)
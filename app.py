@@ -1,54 +1,235 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, session
-import pandas as pd
+from flask import Blueprint, Flask, Response, abort, current_app, make_response, stream_with_context, render_template, request, redirect, url_for, flash, send_file, jsonify, session
+import functools
+import io
+import logging
 import os
+from werkzeug.exceptions import HTTPException, TooManyRequests
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
-from database import DatabaseManager
-from document_generator import DocumentGenerator
+from config import config
+from batch import RESULT_FIELDS, Batch, BatchStore
+from retention import RetentionManager, remove_file
+from file_cache import LRUFileCache
+from locks import LockTimeout, batch_lock, generation_job_key
+from storage import create_storage
+from resolution_types import ResolutionRegistry
+from structured_logging import configure_logging, correlation
+from admission import AdmissionController, AdmissionRejected
+from upload_guard import RosterTooLarge, inspect_roster, save_upload
 import json
+import time
+import uuid
 import zipfile
-from datetime import datetime
-
-app = Flask(__name__)
-app.secret_key = 'sena_centro_minero_2023_resoluciones'
-
-# Configuración
-UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
-
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
-
-# Configuración de base de datos MySQL
-DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'sena_bienestar',
-    'user': 'root',
-    'password': ''  # CAMBIAR POR TU CONTRASEÑA
-}
-
-# Asegurar que existan los directorios necesarios
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs('generated', exist_ok=True)
-
-# Inicializar base de datos y generador de documentos
-try:
-    db = DatabaseManager(**DB_CONFIG)
-    doc_generator = DocumentGenerator()
-    print("✅ Conexión a MySQL exitosa")
-except Exception as e:
-    print(f"❌ Error al conectar con MySQL: {e}")
-    db = None
-    doc_generator = None
+from datetime import datetime, timedelta
+
+bp = Blueprint('main', __name__)
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(config_name=None):
+    """Crea la aplicación Flask sin tocar la base de datos ni cargar pandas/python-docx"""
+    app = Flask(__name__)
+    app.config.from_object(config[config_name or os.environ.get('FLASK_CONFIG', 'default')])
+    configure_logging(app.config['LOG_LEVEL'], app.config['LOG_SAMPLE_FIRST'], app.config['LOG_SAMPLE_EVERY'])
+    
+    # Asegurar que existan los directorios necesarios
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['GENERATED_FOLDER'], exist_ok=True)
+    
+    app.register_blueprint(bp)
+    
+    # Retención de archivos: la primera limpieza ocurre al cumplirse el intervalo
+    retention = RetentionManager([app.config['UPLOAD_FOLDER'], app.config['GENERATED_FOLDER']],
+                                 app.config['RETENTION_MAX_AGE_DAYS'], app.config['RETENTION_MAX_BYTES'],
+                                 db_factory=lambda: get_db_for(app))
+    app.extensions['retention'] = retention
+    if app.config['RETENTION_INTERVAL_SECONDS']:
+        retention.start(app.config['RETENTION_INTERVAL_SECONDS'])
+    
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Crea la base de datos, aplica las migraciones pendientes y carga las plantillas por defecto"""
+        create_db_manager(app).init_schema()
+    
+    @app.cli.command('refresh-stats')
+    def refresh_stats_command():
+        """Recalcula las estadísticas agregadas del tablero desde las tablas"""
+        if create_db_manager(app).refresh_estadisticas():
+            print("✅ Estadísticas recalculadas")
+    
+    @app.cli.command('cleanup')
+    def cleanup_command():
+        """Elimina los archivos vencidos o que exceden la cuota de disco"""
+        print(f"🧹 {retention.evict()} archivos eliminados")
+    
+    return app
+
+
+def create_db_manager(app):
+    """Construye el gestor de base de datos con la configuración MySQL de la aplicación"""
+    from database import DatabaseManager
+    
+    return DatabaseManager(host=app.config['MYSQL_HOST'],
+                           database=app.config['MYSQL_DATABASE'],
+                           user=app.config['MYSQL_USER'],
+                           password=app.config['MYSQL_PASSWORD'],
+                           port=app.config['MYSQL_PORT'])
+
+
+def get_db():
+    """Obtiene el gestor de base de datos, verificando la conexión en el primer uso"""
+    if 'db' not in current_app.extensions:
+        # Tras un fallo no se guarda None: se reintenta pasada una breve espera
+        if time.monotonic() < current_app.extensions.get('db_reintento', 0):
+            return None
+        db = create_db_manager(current_app)
+        connection = db.get_connection()
+        if not connection:
+            current_app.extensions['db_reintento'] = time.monotonic() + current_app.config['MYSQL_RETRY_SECONDS']
+            return None
+        connection.close()
+        logger.info("Conexión a MySQL exitosa")
+        current_app.extensions['db'] = db
+    return current_app.extensions['db']
+
+
+def get_db_for(app):
+    """Obtiene el gestor de base de datos fuera de una petición (hilos en segundo plano)"""
+    with app.app_context():
+        return get_db()
+
+
+def get_doc_generator():
+    """Obtiene el generador de documentos, importando python-docx en el primer uso"""
+    if 'doc_generator' not in current_app.extensions:
+        from document_generator import DocumentGenerator
+        firma = {
+            'nombre': current_app.config['SUBDIRECTOR_NOMBRE'],
+            'cargo': current_app.config['SUBDIRECTOR_CARGO'],
+            'revisiones': current_app.config['RESOLUCION_REVISIONES'],
+        }
+        current_app.extensions['doc_generator'] = DocumentGenerator(current_app.config['GENERATED_FOLDER'],
+                                                                    storage=get_storage(), firma=firma)
+    return current_app.extensions['doc_generator']
+
+
+def get_resolution_types():
+    """Obtiene el registro de tipos de resolución, cargados de plantillas una vez por proceso"""
+    if 'resolution_types' not in current_app.extensions:
+        app = current_app._get_current_object()
+        current_app.extensions['resolution_types'] = ResolutionRegistry(lambda: get_db_for(app))
+    return current_app.extensions['resolution_types']
+
+
+def get_storage():
+    """Obtiene el backend de almacenamiento de documentos configurado"""
+    if 'storage' not in current_app.extensions:
+        app = current_app._get_current_object()
+        current_app.extensions['storage'] = create_storage(app.config, lambda: get_db_for(app))
+    return current_app.extensions['storage']
+
+
+def get_batch_store():
+    """Obtiene el almacén de lotes en tránsito"""
+    if 'batch_store' not in current_app.extensions:
+        current_app.extensions['batch_store'] = BatchStore(current_app.config['BATCH_FOLDER'])
+    return current_app.extensions['batch_store']
+
+
+def get_file_cache():
+    """Obtiene la caché en memoria de archivos pequeños para descargas"""
+    if 'file_cache' not in current_app.extensions:
+        current_app.extensions['file_cache'] = LRUFileCache(current_app.config['FILE_CACHE_MAX_BYTES'],
+                                                            current_app.config['FILE_CACHE_MAX_ITEM_BYTES'])
+    return current_app.extensions['file_cache']
+
+
+def get_admission():
+    """Obtiene el control de admisión de las rutas pesadas"""
+    if 'admission' not in current_app.extensions:
+        current_app.extensions['admission'] = AdmissionController(
+            {'generacion': current_app.config['ADMISSION_MAX_GENERACIONES'],
+             'carga': current_app.config['ADMISSION_MAX_CARGAS'],
+             'descarga': current_app.config['ADMISSION_MAX_DESCARGAS']},
+            current_app.config['ADMISSION_PER_CLIENT'],
+            current_app.config['ADMISSION_RETRY_AFTER_SECONDS'])
+    return current_app.extensions['admission']
+
+
+def admission_control(clase, respuesta_json=False):
+    """Aplica el control de admisión a las peticiones POST de una ruta (429 si no hay cupo)"""
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method != 'POST':
+                return vista(*args, **kwargs)
+            # Cada navegador se identifica con un id en su sesión; los clientes que no
+            # devuelven la cookie se identifican por su dirección IP
+            cliente = session.get('cliente_id') or request.remote_addr
+            session.setdefault('cliente_id', uuid.uuid4().hex)
+            try:
+                with get_admission().admit(clase, cliente):
+                    return vista(*args, **kwargs)
+            except AdmissionRejected as e:
+                logger.warning("Solicitud rechazada por control de admisión: %s", e,
+                               extra={'clase': clase, 'cliente': cliente})
+                if respuesta_json:
+                    response = jsonify({'error': str(e)})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(e.retry_after)
+                    return response
+                raise TooManyRequests(str(e), retry_after=e.retry_after)
+        return envoltura
+    return decorador
+
+
+def store_upload(file, filepath):
+    """Guarda el archivo cargado por partes y verifica sus límites antes de leerlo; lo elimina si no cumple"""
+    try:
+        save_upload(file, filepath, current_app.config['UPLOAD_MAX_BYTES'])
+        inspect_roster(filepath, current_app.config['UPLOAD_MAX_ROWS'], current_app.config['UPLOAD_MAX_COLUMNS'],
+                       current_app.config['UPLOAD_MAX_UNCOMPRESSED_BYTES'])
+    except Exception:
+        remove_file(filepath)
+        raise
+
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Página principal"""
     return render_template('index.html')
 
-@app.route('/upload', methods=['GET', 'POST'])
+@bp.route('/api/estadisticas')
+def api_estadisticas():
+    """Estadísticas del tablero, leídas de la tabla de agregados"""
+    db = get_db()
+    estadisticas = db.get_estadisticas() if db else {}
+    
+    registros = estadisticas.get('registros', {})
+    procesados = registros.get('exitosos', 0) + registros.get('fallidos', 0)
+    
+    return jsonify({
+        'resoluciones_total': sum(estadisticas.get('tipo', {}).values()),
+        'aprendices_total': estadisticas.get('aprendices', {}).get('total', 0),
+        'por_tipo': estadisticas.get('tipo', {}),
+        'por_mes': estadisticas.get('mes', {}),
+        'por_programa': estadisticas.get('programa', {}),
+        'por_ficha': estadisticas.get('ficha', {}),
+        'cargas': {
+            'total': estadisticas.get('cargas', {}).get('total', 0),
+            'por_estado': estadisticas.get('cargas_estado', {}),
+            'registros_exitosos': registros.get('exitosos', 0),
+            'registros_fallidos': registros.get('fallidos', 0),
+            'tasa_exito': round(registros.get('exitosos', 0) / procesados, 4) if procesados else None,
+        },
+    })
+
+@bp.route('/upload', methods=['GET', 'POST'])
+@admission_control('carga')
 def upload_file():
     """Subir archivo con listado de aprendices"""
     if request.method == 'POST':
@@ -68,218 +249,402 @@ def upload_file():
             return redirect(request.url)
         
         if file and allowed_file(file.filename):
+            # Los eventos de la carga comparten su identificador, que también es el del lote y da
+            # un nombre único a la copia en disco (dos cargas del mismo archivo no se pisan)
+            carga_ref = uuid.uuid4().hex
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{carga_ref}_{filename}")
+            try:
+                store_upload(file, filepath)
+            except ValueError as e:
+                logger.warning("Archivo rechazado %s: %s", filename, e)
+                flash(str(e), 'error')
+                return redirect(request.url)
             
             # Procesar archivo
-            try:
-                if filename.endswith('.csv'):
-                    df = pd.read_csv(filepath, encoding='utf-8')
-                else:
-                    df = pd.read_excel(filepath)
-                
-                # Validar columnas requeridas
-                required_columns = ['numero_documento', 'tipo_documento', 'nombres', 'apellidos', 'programa', 'ficha']
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                
-                if missing_columns:
-                    flash(f'Faltan columnas requeridas: {", ".join(missing_columns)}', 'error')
-                    return redirect(request.url)
-                
-                # Limpiar datos
-                df = df.dropna(subset=['numero_documento', 'nombres', 'apellidos'])
-                
-                # Registrar carga masiva
-                if db:
-                    carga_id = db.insert_carga_masiva(filename, tipo_resolucion, len(df))
-                
-                # Procesar datos
-                processed_data = []
-                errors = []
-                exitosos = 0
-                fallidos = 0
-                
-                for index, row in df.iterrows():
-                    try:
-                        # Validar y limpiar datos
-                        aprendiz_data = {
-                            'numero_documento': str(row['numero_documento']).strip(),
-                            'tipo_documento': str(row['tipo_documento']).strip() if not pd.isna(row['tipo_documento']) else 'CC',
-                            'nombres': str(row['nombres']).strip().upper(),
-                            'apellidos': str(row['apellidos']).strip().upper(),
-                            'programa': str(row['programa']).strip(),
-                            'ficha': str(row['ficha']).strip(),
-                            'fecha_nacimiento': str(row['fecha_nacimiento']) if 'fecha_nacimiento' in row and not pd.isna(row['fecha_nacimiento']) else None,
-                            'telefono': str(row['telefono']) if 'telefono' in row and not pd.isna(row['telefono']) else None,
-                            'email': str(row['email']) if 'email' in row and not pd.isna(row['email']) else None
-                        }
-                        
-                        # Insertar en base de datos
-                        if db:
-                            aprendiz_id = db.insert_aprendiz(aprendiz_data)
-                            if aprendiz_id:
-                                processed_data.append({**aprendiz_data, 'id': aprendiz_id, 'status': 'nuevo'})
-                                exitosos += 1
+            with correlation(carga_ref):
+                try:
+                    from data_loader import REQUIRED_COLUMNS, normalize_roster, read_roster
+                    
+                    db = get_db()
+                    df = read_roster(filepath, max_rows=current_app.config['UPLOAD_MAX_ROWS'])
+                    
+                    # Validar columnas requeridas
+                    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+                    
+                    if missing_columns:
+                        flash(f'Faltan columnas requeridas: {", ".join(missing_columns)}', 'error')
+                        return redirect(request.url)
+                    
+                    # Limpiar datos
+                    lote = normalize_roster(df)
+                    del df
+                    
+                    # Registrar carga masiva
+                    if db:
+                        carga_id = db.insert_carga_masiva(filename, tipo_resolucion, len(lote))
+                    
+                    # Procesar datos
+                    errors = []
+                    exitosos = 0
+                    fallidos = 0
+                    
+                    for index, aprendiz in enumerate(lote):
+                        try:
+                            # Insertar en base de datos
+                            if db:
+                                aprendiz_id, nuevo = db.insert_aprendiz(aprendiz)
+                                if aprendiz_id is None:
+                                    raise ValueError('No se pudo registrar el aprendiz')
+                                lote.set(index, 'id', aprendiz_id)
+                                lote.set(index, 'status', 'nuevo' if nuevo else 'existente')
                             else:
-                                processed_data.append({**aprendiz_data, 'status': 'existente'})
-                                exitosos += 1
-                        else:
-                            processed_data.append({**aprendiz_data, 'status': 'nuevo'})
+                                lote.set(index, 'status', 'nuevo')
                             exitosos += 1
+                        
+                        except Exception as e:
+                            errors.append(f'Fila {aprendiz["fila"]}: {str(e)}')
+                            fallidos += 1
+                            logger.warning("Error en la fila %s: %s", aprendiz['fila'], e,
+                                           extra={'evento': 'error_fila_carga'})
                     
-                    except Exception as e:
-                        errors.append(f'Fila {index + 2}: {str(e)}')
-                        fallidos += 1
-                
-                # Actualizar carga masiva
-                if db and 'carga_id' in locals():
-                    db.update_carga_masiva(carga_id, exitosos, fallidos)
-                
-                # Guardar datos en sesión
-                session['processed_data'] = processed_data
-                session['tipo_resolucion'] = tipo_resolucion
-                session['errors'] = errors
-                
-                flash(f'Archivo procesado exitosamente: {exitosos} registros cargados', 'success')
-                if errors:
-                    flash(f'Se encontraron {len(errors)} errores', 'warning')
-                
-                return redirect(url_for('validate_data'))
-                
-            except Exception as e:
-                flash(f'Error al procesar archivo: {str(e)}', 'error')
-                return redirect(request.url)
+                    # Actualizar carga masiva
+                    if db and 'carga_id' in locals():
+                        db.update_carga_masiva(carga_id, exitosos, fallidos)
+                    
+                    # Guardar el lote en disco y su identificador en sesión
+                    session['batch_id'] = get_batch_store().save(lote, carga_ref)
+                    if db:
+                        db.register_archivos([(filepath, session['batch_id'], 'CARGA', os.path.getsize(filepath))])
+                    session['tipo_resolucion'] = tipo_resolucion
+                    session['errors'] = errors
+                    logger.info("Carga procesada", extra={'archivo': filename, 'tipo_resolucion': tipo_resolucion,
+                                                          'exitosos': exitosos, 'fallidos': fallidos})
+                    
+                    flash(f'Archivo procesado exitosamente: {exitosos} registros cargados', 'success')
+                    if errors:
+                        flash(f'Se encontraron {len(errors)} errores', 'warning')
+                    
+                    return redirect(url_for('main.validate_data'))
+                    
+                except Exception as e:
+                    logger.exception("Error al procesar archivo %s", filename)
+                    flash(f'Error al procesar archivo: {str(e)}', 'error')
+                    return redirect(request.url)
         
         flash('Tipo de archivo no permitido. Use Excel (.xlsx, .xls) o CSV (.csv)', 'error')
         return redirect(request.url)
     
     return render_template('upload.html')
 
-@app.route('/validate')
+@bp.route('/validar-archivo', methods=['POST'])
+@admission_control('carga', respuesta_json=True)
+def validate_file():
+    """Validar un listado sin cargarlo: devuelve un reporte JSON y no escribe en la base de datos"""
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({'error': 'No se seleccionó archivo'}), 400
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Tipo de archivo no permitido. Use Excel (.xlsx, .xls) o CSV (.csv)'}), 400
+
+    from data_loader import normalize_roster, read_roster, validate_roster
+
+    # Copia temporal con nombre único: se elimina al terminar la validación
+    filename = secure_filename(file.filename)
+    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f"validacion_{uuid.uuid4().hex[:8]}_{filename}")
+    try:
+        store_upload(file, filepath)
+    except RosterTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        df = read_roster(filepath, max_rows=current_app.config['UPLOAD_MAX_ROWS'])
+        reporte = validate_roster(df)
+        if reporte['columnas_faltantes']:
+            return jsonify({'valido': False, 'total_filas': len(df), **reporte})
+
+        lote = normalize_roster(df)
+        del df
+
+        # Una sola consulta por bloque en lugar de un intento de inserción por fila
+        db = get_db()
+        documentos = lote.column('numero_documento')
+        existentes = db.get_aprendices_existentes(documentos) if db else set()
+
+        return jsonify({
+            'valido': not reporte['filas_incompletas'] and not reporte['duplicados_archivo'],
+            'total_filas': len(lote) + len(reporte['filas_incompletas']),
+            'filas_validas': len(lote),
+            'nuevos': len(set(documentos) - existentes),
+            'existentes': sorted(existentes),
+            'base_datos': db is not None,
+            **reporte,
+        })
+
+    except Exception as e:
+        return jsonify({'error': f'Error al procesar archivo: {str(e)}'}), 400
+    finally:
+        remove_file(filepath)
+
+@bp.route('/validate')
 def validate_data():
     """Validar datos cargados"""
-    processed_data = session.get('processed_data', [])
+    processed_data = get_batch_store().load(session.get('batch_id'))
     tipo_resolucion = session.get('tipo_resolucion', '')
     errors = session.get('errors', [])
     
     if not processed_data:
         flash('No hay datos para validar. Cargue un archivo primero.', 'error')
-        return redirect(url_for('upload_file'))
+        return redirect(url_for('main.upload_file'))
     
     return render_template('validate.html', 
                          data=processed_data, 
                          tipo_resolucion=tipo_resolucion,
                          errors=errors)
 
-@app.route('/generate', methods=['GET', 'POST'])
+@bp.route('/generate', methods=['GET', 'POST'])
+@admission_control('generacion')
 def generate_resolutions():
     """Generar resoluciones"""
+    db = get_db()
+    
     if request.method == 'POST':
         aprendices_seleccionados = request.form.getlist('aprendices')
         numero_inicial = int(request.form.get('numero_inicial', 1))
         prefijo = request.form.get('prefijo', '15-')
+        periodo = int(request.form.get('periodo') or datetime.now().year)
+        omitir_duplicados = request.form.get('omitir_duplicados') == '1'
         
         # Obtener tipo de resolución de la sesión
         tipo_resolucion = session.get('tipo_resolucion')
         
         if not tipo_resolucion:
             flash('No se encontró el tipo de resolución. Cargue un archivo primero.', 'error')
-            return redirect(url_for('upload_file'))
+            return redirect(url_for('main.upload_file'))
         
         if not aprendices_seleccionados:
             flash('Debe seleccionar al menos un aprendiz', 'error')
             return redirect(request.url)
         
-        # Obtener plantilla específica para el tipo de resolución
-        if db:
-            plantillas = db.get_plantillas_by_tipo(tipo_resolucion)
-        else:
-            plantillas = []
+        # Definición del tipo de resolución (plantilla leída una vez por proceso)
+        tipo_definicion = get_resolution_types().get(tipo_resolucion)
         
-        if not plantillas:
+        if not tipo_definicion:
             flash(f'No se encontró plantilla para el tipo de resolución: {tipo_resolucion}', 'error')
             return redirect(request.url)
         
-        plantilla = plantillas[0]  # Usar la primera plantilla del tipo
-        plantilla_data = {
-            'id': plantilla[0],
-            'nombre': plantilla[1],
-            'tipo': plantilla[2],
-            'descripcion': plantilla[3] if len(plantilla) > 3 else '',
-            'contenido': plantilla[4] if len(plantilla) > 4 else plantilla[3],
-            'variables': plantilla[5] if len(plantilla) > 5 else plantilla[4]
-        }
-        
         # Obtener datos de aprendices seleccionados
-        processed_data = session.get('processed_data', [])
+        processed_data = get_batch_store().load(session.get('batch_id')) or []
+        aprendices_seleccionados = set(aprendices_seleccionados)
         aprendices_data = []
+        # Un documento repetido en el listado recibe una sola resolución
+        repetidos = []
+        documentos_vistos = set()
         
         for aprendiz in processed_data:
             if str(aprendiz.get('id', '')) in aprendices_seleccionados or aprendiz['numero_documento'] in aprendices_seleccionados:
+                if aprendiz['numero_documento'] in documentos_vistos:
+                    repetidos.append(aprendiz)
+                    continue
+                documentos_vistos.add(aprendiz['numero_documento'])
                 aprendices_data.append(aprendiz)
         
         if not aprendices_data:
             flash('No se encontraron los aprendices seleccionados', 'error')
             return redirect(request.url)
         
+        # Números asignados por posición en la selección antes de descartar duplicados: un
+        # reintento del mismo lote emite a cada aprendiz el mismo número y nunca el de otro
+        numeros = {aprendiz['numero_documento']: f"{prefijo}{i:05d}"
+                   for i, aprendiz in enumerate(aprendices_data, numero_inicial)}
+        
+        # Clave idempotente del trabajo: la misma selección, numeración y datos producen el mismo lote,
+        # que además da nombre al subdirectorio de salida
+        lote_id = generation_job_key(tipo_resolucion, prefijo, numero_inicial, periodo, omitir_duplicados,
+                                     aprendices_data)
+        
         # Generar resoluciones
-        try:
-            generated_files = []
-            
-            for i, aprendiz in enumerate(aprendices_data, numero_inicial):
-                # Generar número de resolución único
-                numero_resolucion = f"{prefijo}{i:05d}"
-                
-                try:
-                    filepath = doc_generator.generate_resolution(aprendiz, plantilla_data, numero_resolucion)
+        with correlation(lote_id):
+            try:
+                # El bloqueo es por lote: lotes distintos se generan en paralelo y la regla de una
+                # resolución por tipo y periodo la aplica la base de datos al registrar cada una
+                with batch_lock(f"generacion_{lote_id}", db, current_app.config['LOCK_FOLDER'],
+                                current_app.config['GENERATION_LOCK_TIMEOUT']):
+                    # Si otro proceso (o un envío repetido) ya generó este lote sin errores, se reutiliza
+                    # el resultado; un lote con errores se vuelve a intentar
+                    previo = get_batch_store().load(lote_id)
+                    if previo is not None and not previo.count('status', 'error'):
+                        session['results_id'] = lote_id
+                        session['summary_file'] = previo.meta.get('summary_file', '')
+                        flash('Este lote ya había sido generado; se muestran los resultados existentes', 'info')
+                        return redirect(url_for('main.results'))
                     
-                    # Guardar resolución en base de datos
-                    if db and aprendiz.get('id'):
-                        db.insert_resolucion(numero_resolucion, tipo_resolucion, aprendiz['id'], 
-                                           plantilla_data['contenido'], filepath)
+                    doc_generator = get_doc_generator()
+                    generated_files = Batch(RESULT_FIELDS)
                     
-                    generated_files.append({
-                        'aprendiz': f"{aprendiz['nombres']} {aprendiz['apellidos']}",
-                        'numero_documento': aprendiz['numero_documento'],
-                        'numero_resolucion': numero_resolucion,
-                        'filepath': filepath,
-                        'status': 'success'
-                    })
+                    # Reintento de un lote con errores: las filas exitosas se conservan y solo se
+                    # vuelven a generar las fallidas
+                    if previo is not None:
+                        for fila in previo:
+                            if fila['status'] == 'success':
+                                generated_files.append(**fila.to_dict())
+                        conservados = set(generated_files.column('numero_documento'))
+                        aprendices_data = [aprendiz for aprendiz in aprendices_data
+                                           if aprendiz['numero_documento'] not in conservados]
                     
-                except Exception as e:
-                    generated_files.append({
-                        'aprendiz': f"{aprendiz['nombres']} {aprendiz['apellidos']}",
-                        'numero_documento': aprendiz['numero_documento'],
-                        'numero_resolucion': numero_resolucion,
-                        'filepath': None,
-                        'status': 'error',
-                        'error': str(e)
-                    })
-            
-            # Crear resumen
-            summary_file = doc_generator.create_batch_summary(generated_files)
-            
-            # Guardar resultados en sesión
-            session['generated_files'] = generated_files
-            session['summary_file'] = summary_file
-            
-            exitosos = len([f for f in generated_files if f['status'] == 'success'])
-            flash(f'Se generaron {exitosos} de {len(generated_files)} resoluciones exitosamente', 'success')
-            
-            return redirect(url_for('results'))
+                    # Detectar, con una sola consulta por lote, aprendices que ya tienen resolución del tipo en el periodo
+                    duplicados = {}
+                    if db:
+                        duplicados = db.get_resoluciones_existentes(
+                            [aprendiz['numero_documento'] for aprendiz in aprendices_data], tipo_resolucion,
+                            datetime(periodo, 1, 1), datetime(periodo + 1, 1, 1))
+                    
+                    for aprendiz in repetidos:
+                        generated_files.append(
+                            aprendiz=f"{aprendiz['nombres']} {aprendiz['apellidos']}",
+                            numero_documento=aprendiz['numero_documento'],
+                            ficha=aprendiz['ficha'],
+                            tipo_resolucion=tipo_resolucion,
+                            numero_resolucion='',
+                            status='duplicado',
+                            error=f'Documento repetido en el listado (fila {aprendiz["fila"]})'
+                        )
+                    
+                    if duplicados and omitir_duplicados:
+                        for aprendiz in aprendices_data:
+                            if aprendiz['numero_documento'] in duplicados:
+                                generated_files.append(
+                                    aprendiz=f"{aprendiz['nombres']} {aprendiz['apellidos']}",
+                                    numero_documento=aprendiz['numero_documento'],
+                                    ficha=aprendiz['ficha'],
+                                    tipo_resolucion=tipo_resolucion,
+                                    numero_resolucion=duplicados[aprendiz['numero_documento']],
+                                    status='duplicado'
+                                )
+                        aprendices_data = [aprendiz for aprendiz in aprendices_data
+                                           if aprendiz['numero_documento'] not in duplicados]
+                    
+                    generados = []
+                    for aprendiz in aprendices_data:
+                        numero_resolucion = numeros[aprendiz['numero_documento']]
+                        
+                        inicio = time.perf_counter()
+                        try:
+                            filepath = doc_generator.generate_resolution(aprendiz, tipo_definicion, numero_resolucion, lote_id)
+                            
+                            generados.append((len(generated_files), aprendiz, numero_resolucion, filepath))
+                            generated_files.append(
+                                aprendiz=f"{aprendiz['nombres']} {aprendiz['apellidos']}",
+                                numero_documento=aprendiz['numero_documento'],
+                                ficha=aprendiz['ficha'],
+                                tipo_resolucion=tipo_resolucion,
+                                numero_resolucion=numero_resolucion,
+                                filepath=filepath,
+                                status='success',
+                                duracion_ms=round((time.perf_counter() - inicio) * 1000)
+                            )
+                        
+                        except Exception as e:
+                            generated_files.append(
+                                aprendiz=f"{aprendiz['nombres']} {aprendiz['apellidos']}",
+                                numero_documento=aprendiz['numero_documento'],
+                                ficha=aprendiz['ficha'],
+                                tipo_resolucion=tipo_resolucion,
+                                numero_resolucion=numero_resolucion,
+                                status='error',
+                                error=str(e),
+                                duracion_ms=round((time.perf_counter() - inicio) * 1000)
+                            )
+                            logger.warning("Error al generar la resolución %s: %s", numero_resolucion, e,
+                                           extra={'evento': 'error_generacion',
+                                                  'numero_documento': aprendiz['numero_documento']})
+                    
+                    # Al omitir duplicados, la base de datos rechaza al registrar una segunda resolución del
+                    # tipo en el periodo emitida por otro lote en curso
+                    rango = {}
+                    if db:
+                        from database import ResolucionDuplicada
+                        if omitir_duplicados:
+                            rango = {'desde': datetime(periodo, 1, 1), 'hasta': datetime(periodo + 1, 1, 1)}
+                    
+                    # Publicar en paralelo en el almacenamiento configurado antes de registrar las resoluciones:
+                    # un registro solo apunta a documentos ya guardados en el backend
+                    errores = doc_generator.publish([filepath for _, _, _, filepath in generados],
+                                                    current_app.config['STORAGE_UPLOAD_WORKERS'])
+                    for (indice, aprendiz, numero_resolucion, filepath), error in zip(generados, errores):
+                        if error:
+                            generated_files.set(indice, 'status', 'error')
+                            generated_files.set(indice, 'error', f'No se pudo guardar el documento: {error}')
+                            logger.warning("Error al publicar la resolución %s: %s", numero_resolucion, error,
+                                           extra={'evento': 'error_publicacion',
+                                                  'numero_documento': aprendiz['numero_documento']})
+                        elif db and aprendiz.get('id'):
+                            try:
+                                resolucion_id = db.insert_resolucion(
+                                    numero_resolucion, tipo_resolucion, aprendiz['id'], tipo_definicion.contenido,
+                                    doc_generator.storage_key(filepath), **rango)
+                            except ResolucionDuplicada as e:
+                                # Otro lote la emitió después de la consulta de duplicados
+                                generated_files.set(indice, 'status', 'duplicado')
+                                generated_files.set(indice, 'error', str(e))
+                                continue
+                            if resolucion_id is None:
+                                # Sin registro la resolución no está emitida (p. ej. número ya usado)
+                                generated_files.set(indice, 'status', 'error')
+                                generated_files.set(indice, 'error', 'No se pudo registrar la resolución')
+                            else:
+                                generated_files.set(indice, 'resolucion_id', resolucion_id)
+                    
+                    # Crear resumen
+                    summary_file = doc_generator.create_batch_summary(generated_files, lote_id)
+                    error = doc_generator.publish([summary_file])[0]
+                    if error:
+                        logger.warning("Error al publicar el resumen %s: %s", summary_file, error)
+                    
+                    # Registrar los archivos del lote para la retención
+                    if db:
+                        archivos = [(filepath, lote_id, 'RESOLUCION', os.path.getsize(filepath))
+                                    for filepath in generated_files.column('filepath') if filepath]
+                        archivos.append((summary_file, lote_id, 'RESUMEN', os.path.getsize(summary_file)))
+                        db.register_archivos(archivos)
+                    
+                    # Guardar resultados en disco y su identificador en sesión
+                    generated_files.meta['summary_file'] = summary_file
+                    session['results_id'] = get_batch_store().save(generated_files, lote_id)
+                    session['summary_file'] = summary_file
+                    
+                    exitosos = generated_files.count('status', 'success')
+                    logger.info("Lote generado", extra={'tipo_resolucion': tipo_resolucion, 'total': len(generated_files),
+                                                        'exitosos': exitosos, 'duplicados': len(duplicados)})
+                    flash(f'Se generaron {exitosos} de {len(generated_files)} resoluciones exitosamente', 'success')
+                    if repetidos:
+                        flash(f'Se omitieron {len(repetidos)} filas con documentos repetidos en el listado', 'warning')
+                    if duplicados:
+                        if omitir_duplicados:
+                            flash(f'Se omitieron {len(duplicados)} aprendices que ya tenían resolución {tipo_resolucion} en {periodo}', 'warning')
+                        else:
+                            flash(f'{len(duplicados)} aprendices ya tenían resolución {tipo_resolucion} en {periodo}', 'warning')
+                    
+                    return redirect(url_for('main.results'))
             
-        except Exception as e:
-            flash(f'Error al generar resoluciones: {str(e)}', 'error')
-            return redirect(request.url)
+            except LockTimeout:
+                # No se espera al otro proceso: se responde de inmediato para no retener el hilo ni el cupo
+                raise TooManyRequests('Este lote ya se está generando en otro proceso. Intente de nuevo en unos minutos.',
+                                      retry_after=current_app.config['ADMISSION_RETRY_AFTER_SECONDS'])
+            except Exception as e:
+                logger.exception("Error al generar resoluciones")
+                flash(f'Error al generar resoluciones: {str(e)}', 'error')
+                return redirect(request.url)
     
     # GET - Mostrar formulario
-    processed_data = session.get('processed_data', [])
+    processed_data = get_batch_store().load(session.get('batch_id'))
     tipo_resolucion = session.get('tipo_resolucion', '')
     
     if not processed_data:
         flash('No hay datos cargados. Cargue un archivo primero.', 'error')
-        return redirect(url_for('upload_file'))
+        return redirect(url_for('main.upload_file'))
     
     # Obtener plantillas para el tipo seleccionado
     if db:
@@ -290,71 +655,211 @@ def generate_resolutions():
     return render_template('generate.html', 
                          plantillas=plantillas, 
                          aprendices=processed_data,
-                         tipo_resolucion=tipo_resolucion)
+                         tipo_resolucion=tipo_resolucion,
+                         periodo=datetime.now().year)
 
-@app.route('/results')
+@bp.route('/results')
 def results():
     """Mostrar resultados de generación"""
-    generated_files = session.get('generated_files', [])
+    generated_files = get_batch_store().load(session.get('results_id'))
     summary_file = session.get('summary_file', '')
     
     if not generated_files:
         flash('No hay resultados para mostrar', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     return render_template('results.html', 
                          generated_files=generated_files,
                          summary_file=summary_file)
 
-@app.route('/download/<filename>')
+def send_generated_file(filepath):
+    """Envía un archivo con ETag/Last-Modified, soporte de 304 y Range, y caché en memoria si es pequeño"""
+    stat = os.stat(filepath)
+    etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    max_age = current_app.config['DOWNLOAD_MAX_AGE_SECONDS']
+    
+    data = get_file_cache().get(filepath, stat.st_mtime_ns, stat.st_size)
+    if data is None:
+        response = send_file(filepath, as_attachment=True, conditional=True, etag=etag, max_age=max_age)
+    else:
+        response = send_file(io.BytesIO(data), as_attachment=True, download_name=os.path.basename(filepath),
+                             conditional=False, etag=etag, last_modified=stat.st_mtime, max_age=max_age)
+        response = response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+    
+    # Los documentos son de los aprendices: solo el navegador puede guardarlos en caché
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def generated_key(filepath):
+    """Llave de almacenamiento de un archivo de la carpeta de generados; None si está fuera de ella"""
+    generated_folder = os.path.abspath(current_app.config['GENERATED_FOLDER'])
+    filepath = os.path.abspath(filepath)
+    if os.path.commonpath([filepath, generated_folder]) != generated_folder:
+        return None
+    return os.path.relpath(filepath, generated_folder).replace(os.sep, '/')
+
+
+def send_stored_document(key):
+    """Envía un documento del almacenamiento: directo si está en disco local, por partes si no"""
+    storage = get_storage()
+    filepath = storage.local_path(key)
+    if filepath:
+        return send_generated_file(filepath)
+    
+    stat = storage.stat(key)
+    if stat is None:
+        abort(404)
+    size, mtime = stat
+    
+    response = Response(storage.open(key), mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+    response.headers['Content-Disposition'] = f'attachment; filename={os.path.basename(key)}'
+    response.content_length = size
+    response.set_etag(f"{int(mtime * 1e9):x}-{size:x}")
+    response.last_modified = mtime
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['DOWNLOAD_MAX_AGE_SECONDS']
+    return response.make_conditional(request, accept_ranges=True, complete_length=size)
+
+
+@bp.route('/resoluciones/<int:resolucion_id>/descargar')
+def download_resolucion(resolucion_id):
+    """Descargar una resolución por su identificador"""
+    db = get_db()
+    resolucion = db.get_resolucion(resolucion_id) if db else None
+    
+    if not resolucion or not resolucion[1]:
+        abort(404)
+    
+    return send_stored_document(resolucion[1])
+
+@bp.route('/download/<path:filename>')
 def download_file(filename):
-    """Descargar archivo generado"""
+    """Descargar archivo generado (resoluciones y resumen del lote) desde el almacenamiento"""
+    # El nombre es la llave relativa a la carpeta de generados; el 404 se lanza fuera del try
+    # para que no termine como redirección con mensaje
+    filepath = safe_join(os.path.abspath(current_app.config['GENERATED_FOLDER']), filename)
+    if filepath is None:
+        abort(404)
+    
     try:
-        return send_file(os.path.join('generated', filename), as_attachment=True)
+        return send_stored_document(generated_key(filepath))
+    except HTTPException:
+        raise
     except Exception as e:
         flash(f'Error al descargar archivo: {str(e)}', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
-@app.route('/download-multiple', methods=['POST'])
+@bp.route('/download-multiple', methods=['POST'])
+@admission_control('descarga')
 def download_multiple():
     """Descargar múltiples archivos en ZIP"""
     files = request.form.getlist('files')
     if not files:
         flash('No se seleccionaron archivos', 'error')
-        return redirect(url_for('results'))
+        return redirect(url_for('main.results'))
     
     try:
         # Crear archivo ZIP
-        zip_filename = f"resoluciones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-        zip_path = os.path.join('generated', zip_filename)
+        zip_filename = f"resoluciones_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.zip"
+        zip_path = os.path.join(os.path.abspath(current_app.config['GENERATED_FOLDER']), zip_filename)
+        storage = get_storage()
         
         with zipfile.ZipFile(zip_path, 'w') as zipf:
             for file_path in files:
-                if os.path.exists(file_path):
-                    arcname = os.path.basename(file_path)
-                    zipf.write(file_path, arcname)
+                # Solo se empaquetan archivos de la carpeta de generados, leídos del almacenamiento
+                # (el servidor que atiende la descarga puede no ser el que los generó)
+                key = generated_key(file_path)
+                if key is None:
+                    continue
+                arcname = os.path.basename(key)
+                local_path = storage.local_path(key)
+                if local_path:
+                    zipf.write(local_path, arcname)
+                elif storage.stat(key) is not None:
+                    with zipf.open(arcname, 'w') as destino:
+                        for parte in storage.open(key):
+                            destino.write(parte)
         
-        return send_file(zip_path, as_attachment=True)
+        response = send_file(zip_path, as_attachment=True)
+        # El ZIP es temporal: se elimina al terminar la descarga (sin passthrough para que se ejecute al cerrar)
+        response.direct_passthrough = False
+        response.call_on_close(lambda: remove_file(zip_path))
+        return response
         
     except Exception as e:
         flash(f'Error al crear archivo ZIP: {str(e)}', 'error')
-        return redirect(url_for('results'))
+        return redirect(url_for('main.results'))
+
+@bp.route('/exportar')
+def export_resoluciones():
+    """Exportar el histórico de resoluciones (CSV en streaming o XLSX) filtrado por tipo, fechas y ficha"""
+    from exporter import iter_csv, write_xlsx
+    
+    db = get_db()
+    if not db:
+        flash('La exportación requiere conexión a la base de datos', 'error')
+        return redirect(url_for('main.index'))
+    
+    formato = request.args.get('formato', 'csv').lower()
+    try:
+        desde = datetime.strptime(request.args['desde'], '%Y-%m-%d') if request.args.get('desde') else None
+        # La fecha final es inclusiva
+        hasta = (datetime.strptime(request.args['hasta'], '%Y-%m-%d') + timedelta(days=1)
+                 if request.args.get('hasta') else None)
+    except ValueError:
+        flash('Las fechas deben tener el formato AAAA-MM-DD', 'error')
+        return redirect(url_for('main.index'))
+    
+    filas = db.iter_resoluciones_export(tipo_resolucion=request.args.get('tipo') or None,
+                                        desde=desde, hasta=hasta,
+                                        ficha=request.args.get('ficha') or None)
+    nombre = f"resoluciones_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    
+    if formato == 'xlsx':
+        # El XLSX debe cerrarse antes de enviarse: se escribe en disco en modo write-only
+        xlsx_path = os.path.join(os.path.abspath(current_app.config['GENERATED_FOLDER']),
+                                 f"{nombre}_{uuid.uuid4().hex[:8]}.xlsx")
+        try:
+            write_xlsx(filas, xlsx_path)
+        except Exception:
+            remove_file(xlsx_path)
+            raise
+        response = send_file(xlsx_path, as_attachment=True, download_name=f"{nombre}.xlsx")
+        response.direct_passthrough = False
+        response.call_on_close(lambda: remove_file(xlsx_path))
+        return response
+    
+    return Response(stream_with_context(iter_csv(filas)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={nombre}.csv'})
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found_error(error):
     """Manejar error 404"""
     return render_template('error.html', 
                          error_code=404, 
                          error_message="Página no encontrada"), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(429)
+def too_many_requests_error(error):
+    """Manejar error 429 (control de admisión)"""
+    response = make_response(render_template('error.html', 
+                                             error_code=429, 
+                                             error_message=error.description), 429)
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+@bp.app_errorhandler(500)
 def internal_error(error):
     """Manejar error 500"""
     return render_template('error.html', 
                          error_code=500, 
                          error_message="Error interno del servidor"), 500
 
-@app.context_processor
+@bp.app_context_processor
 def inject_globals():
     """Inyectar variables globales en templates"""
     return {
@@ -364,22 +869,11 @@ def inject_globals():
     }
 
 if __name__ == '__main__':
-    # Verificar conexión a MySQL al iniciar
-    if db is None:
-        print("=" * 50)
-        print("❌ ERROR: No se pudo conectar a MySQL")
-        print("Verifique que:")
-        print("1. MySQL esté instalado y ejecutándose")
-        print("2. Las credenciales sean correctas")
-        print("3. La base de datos 'sena_bienestar' exista")
-        print("=" * 50)
-    else:
-        print("=" * 50)
-        print("✅ Sistema iniciado correctamente")
-        print("✅ Conexión a MySQL establecida")
-        print("✅ Base de datos y tablas creadas")
-        print("✅ Plantillas por defecto cargadas")
-        print("📱 Accede al sistema en: http://localhost:5000")
-        print("=" * 50)
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app = create_app()
+    print("=" * 50)
+    print("✅ Sistema iniciado")
+    print("ℹ️  Para crear la base de datos y las tablas ejecute: flask --app run init-db")
+    print("📱 Accede al sistema en: http://localhost:5000")
+    print("=" * 50)
+    
+    app.run(debug=True, host='0.0.0.0', port=5000)
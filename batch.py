@@ -0,0 +1,136 @@
+"""Lotes compactos por columnas para los datos en tránsito (carga, validación y generación).
+
+Un lote guarda una lista por campo en lugar de un diccionario por aprendiz; las filas se
+leen a través de vistas livianas que se comportan como diccionarios de solo lectura, de modo
+que las plantillas Jinja y el generador de documentos las usan sin cambios.
+"""
+import json
+import os
+import uuid
+
+# Campos de un lote de aprendices cargados
+APRENDIZ_FIELDS = ('fila', 'id', 'numero_documento', 'tipo_documento', 'nombres', 'apellidos',
+                   'programa', 'ficha', 'fecha_nacimiento', 'telefono', 'email', 'status')
+
+# Campos de un lote de resultados de generación
+RESULT_FIELDS = ('aprendiz', 'numero_documento', 'ficha', 'tipo_resolucion', 'numero_resolucion',
+                 'filepath', 'resolucion_id', 'status', 'error', 'duracion_ms')
+
+
+class BatchRow:
+    """Vista de solo lectura sobre una fila de un lote"""
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+
+    def __getitem__(self, campo):
+        return self._batch.columns[campo][self._index]
+
+    def __contains__(self, campo):
+        return campo in self._batch.columns
+
+    def get(self, campo, default=None):
+        columna = self._batch.columns.get(campo)
+        if columna is None:
+            return default
+        valor = columna[self._index]
+        return default if valor is None else valor
+
+    def keys(self):
+        return self._batch.fields
+
+    def to_dict(self):
+        return {campo: self[campo] for campo in self._batch.fields}
+
+
+class Batch:
+    """Lote de registros almacenado por columnas"""
+    __slots__ = ('fields', 'columns', 'meta')
+
+    def __init__(self, fields, columns=None, meta=None):
+        self.fields = tuple(fields)
+        self.columns = columns or {campo: [] for campo in self.fields}
+        # Datos del lote completo (p. ej. la ruta del resumen)
+        self.meta = meta or {}
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield BatchRow(self, index)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return BatchRow(self, index)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def append(self, **valores):
+        """Agrega una fila; los campos no indicados quedan en None"""
+        for campo in self.fields:
+            self.columns[campo].append(valores.get(campo))
+
+    def extend(self, columnas):
+        """Agrega varias filas a partir de listas por campo de igual longitud"""
+        total = len(next(iter(columnas.values())))
+        for campo in self.fields:
+            self.columns[campo].extend(columnas.get(campo) or [None] * total)
+
+    def set(self, index, campo, valor):
+        """Actualiza el valor de un campo en una fila"""
+        self.columns[campo][index] = valor
+
+    def column(self, campo):
+        """Devuelve la lista de valores de un campo"""
+        return self.columns[campo]
+
+    def count(self, campo, valor):
+        """Cuenta las filas cuyo campo tiene el valor indicado"""
+        return self.columns[campo].count(valor)
+
+    def to_json(self):
+        return json.dumps({'fields': self.fields, 'columns': self.columns, 'meta': self.meta},
+                          ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, texto):
+        datos = json.loads(texto)
+        return cls(datos['fields'], datos['columns'], datos.get('meta'))
+
+
+class BatchStore:
+    """Guarda los lotes en disco; la sesión solo conserva su identificador"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _path(self, batch_id):
+        return os.path.join(self.folder, f"{batch_id}.json")
+
+    def save(self, batch, batch_id=None):
+        """Guarda un lote y devuelve su identificador"""
+        batch_id = batch_id or uuid.uuid4().hex
+        # Escritura atómica: otro proceso nunca lee un lote a medio escribir
+        temporal = f"{self._path(batch_id)}.{uuid.uuid4().hex}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(batch.to_json())
+        os.replace(temporal, self._path(batch_id))
+        return batch_id
+
+    def load(self, batch_id):
+        """Carga un lote por identificador, o None si no existe"""
+        if not batch_id or not batch_id.isalnum():
+            return None
+        try:
+            with open(self._path(batch_id), encoding='utf-8') as f:
+                return Batch.from_json(f.read())
+        except (OSError, ValueError):
+            return None
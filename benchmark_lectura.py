@@ -0,0 +1,66 @@
+"""Compara los motores de lectura de Excel sobre listados de aprendices de muestra.
+
+Uso:
+    python benchmark_lectura.py listado1.xlsx listado2.xls [--repeticiones 3]
+"""
+import argparse
+import importlib.util
+import os
+import time
+
+from data_loader import excel_engine, read_roster
+
+# Motor de pandas -> módulo que lo implementa
+MOTORES = {
+    'calamine': 'python_calamine',
+    'openpyxl': 'openpyxl',
+    'xlrd': 'xlrd',
+}
+
+
+def motores_disponibles(filepath):
+    """Lista los motores instalados que pueden leer el archivo"""
+    extension = os.path.splitext(filepath)[1].lower()
+    motores = []
+    for motor, modulo in MOTORES.items():
+        if importlib.util.find_spec(modulo) is None:
+            continue
+        if extension == '.xls' and motor == 'openpyxl':
+            continue
+        if extension == '.xlsx' and motor == 'xlrd':
+            continue
+        motores.append(motor)
+    return motores
+
+
+def medir(filepath, motor, repeticiones):
+    """Devuelve el mejor tiempo (segundos) y el número de filas leídas con un motor"""
+    mejor = None
+    filas = 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        df = read_roster(filepath, engine=motor)
+        duracion = time.perf_counter() - inicio
+        filas = len(df)
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de motores de lectura de Excel')
+    parser.add_argument('archivos', nargs='+', help='Listados de aprendices (.xlsx / .xls)')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    for filepath in args.archivos:
+        print(f"\n{filepath} (motor por defecto: {excel_engine(filepath)})")
+        for motor in motores_disponibles(filepath):
+            try:
+                duracion, filas = medir(filepath, motor, args.repeticiones)
+                print(f"  {motor:<10} {duracion * 1000:10.1f} ms  {filas} filas")
+            except Exception as e:
+                print(f"  {motor:<10} error: {e}")
+
+
+if __name__ == '__main__':
+    main()
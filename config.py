@@ -4,26 +4,78 @@ from datetime import timedelta
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'sena_centro_minero_2023_resoluciones'
-    
-UPLOAD_FOLDER = 'uploads'
-GENERATED_FOLDER = 'generated'
-MAX_CONTENT_LENGTH = 16 * 1024 * 1024
-ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
-
-PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
-
-MYSQL_HOST = os.environ.get('MYSQL_HOST') or 'localhost'
-MYSQL_DATABASE = os.environ.get('MYSQL_DATABASE') or 'sena_bienestar'
-MYSQL_USER = os.environ.get('MYSQL_USER') or 'root'
-MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD') or ''
-
-MYSQL_PORT = int(os.environ.get('MYSQL_PORT',3306))
-
-CENTRO_NOMBRE = "Centro Minero"
-Regional_NOMBRE = "SENA Regional Boyacá"
-CIUDAD = "Sogamoso"
-SUBDIRECTOR_NOMBRE = "Harvey Yadiver Dimaté Rodríguez"
-SUBDIRECTOR_CARGO = "Subdirector (E) Centro Minero"
+
+    UPLOAD_FOLDER = 'uploads'
+    GENERATED_FOLDER = 'generated'
+    BATCH_FOLDER = os.path.join('uploads', 'lotes')
+    LOCK_FOLDER = os.path.join('uploads', 'bloqueos')
+    # Segundos de espera por el bloqueo de un lote que ya se genera en otro proceso (0: rechazar de inmediato)
+    GENERATION_LOCK_TIMEOUT = int(os.environ.get('GENERATION_LOCK_TIMEOUT', 0))
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
+    # Límites de los listados, verificados antes de leerlos (ver upload_guard.py)
+    UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 16 * 1024 * 1024))
+    UPLOAD_MAX_ROWS = int(os.environ.get('UPLOAD_MAX_ROWS', 20000))
+    UPLOAD_MAX_COLUMNS = int(os.environ.get('UPLOAD_MAX_COLUMNS', 50))
+    UPLOAD_MAX_UNCOMPRESSED_BYTES = int(os.environ.get('UPLOAD_MAX_UNCOMPRESSED_BYTES', 100 * 1024 * 1024))
+
+    PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
+
+    MYSQL_HOST = os.environ.get('MYSQL_HOST') or 'localhost'
+    MYSQL_DATABASE = os.environ.get('MYSQL_DATABASE') or 'sena_bienestar'
+    MYSQL_USER = os.environ.get('MYSQL_USER') or 'root'
+    MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD') or ''
+
+    MYSQL_PORT = int(os.environ.get('MYSQL_PORT',3306))
+    # Espera entre intentos de conexión cuando MySQL no está disponible
+    MYSQL_RETRY_SECONDS = int(os.environ.get('MYSQL_RETRY_SECONDS', 5))
+
+    # Retención de archivos en uploads/ y generated/
+    RETENTION_MAX_AGE_DAYS = int(os.environ.get('RETENTION_MAX_AGE_DAYS', 30))
+    RETENTION_MAX_BYTES = int(os.environ.get('RETENTION_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+    RETENTION_INTERVAL_SECONDS = int(os.environ.get('RETENTION_INTERVAL_SECONDS', 3600))
+
+    # Almacenamiento de documentos: 'local', 'mysql' o 's3' (compatible con MinIO)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+    STORAGE_UPLOAD_WORKERS = int(os.environ.get('STORAGE_UPLOAD_WORKERS', 4))
+    # Backend local: copia permanente de los documentos, fuera de la retención de uploads/ y generated/
+    STORAGE_LOCAL_FOLDER = os.environ.get('STORAGE_LOCAL_FOLDER', 'documentos')
+    S3_BUCKET = os.environ.get('S3_BUCKET', 'resoluciones')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+    S3_ACCESS_KEY = os.environ.get('S3_ACCESS_KEY')
+    S3_SECRET_KEY = os.environ.get('S3_SECRET_KEY')
+    S3_REGION = os.environ.get('S3_REGION')
+    S3_PREFIX = os.environ.get('S3_PREFIX', '')
+
+    # Descargas: caché del navegador y caché en memoria para archivos pequeños
+    DOWNLOAD_MAX_AGE_SECONDS = int(os.environ.get('DOWNLOAD_MAX_AGE_SECONDS', 3600))
+    FILE_CACHE_MAX_BYTES = int(os.environ.get('FILE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    FILE_CACHE_MAX_ITEM_BYTES = int(os.environ.get('FILE_CACHE_MAX_ITEM_BYTES', 512 * 1024))
+
+    # Registro en JSON; los errores por fila de un lote se muestrean al superar LOG_SAMPLE_FIRST
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_SAMPLE_FIRST = int(os.environ.get('LOG_SAMPLE_FIRST', 20))
+    LOG_SAMPLE_EVERY = int(os.environ.get('LOG_SAMPLE_EVERY', 100))
+
+    # Control de admisión: peticiones simultáneas por proceso (generación y carga según núcleos)
+    ADMISSION_MAX_GENERACIONES = int(os.environ.get('ADMISSION_MAX_GENERACIONES', os.cpu_count() or 1))
+    ADMISSION_MAX_CARGAS = int(os.environ.get('ADMISSION_MAX_CARGAS', os.cpu_count() or 1))
+    ADMISSION_MAX_DESCARGAS = int(os.environ.get('ADMISSION_MAX_DESCARGAS', 2 * (os.cpu_count() or 1)))
+    ADMISSION_PER_CLIENT = int(os.environ.get('ADMISSION_PER_CLIENT', 1))
+    ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', 5))
+
+    CENTRO_NOMBRE = "Centro Minero"
+    Regional_NOMBRE = "SENA Regional Boyacá"
+    CIUDAD = "Sogamoso"
+    SUBDIRECTOR_NOMBRE = "Harvey Yadiver Dimaté Rodríguez"
+    SUBDIRECTOR_CARGO = "Subdirector (E) Centro Minero"
+    # Visto bueno, revisiones y elaboración que se listan bajo la firma de cada resolución
+    RESOLUCION_REVISIONES = [
+        "VoBo: Julieth Alejandra Viancha Torres: Jurídica Subdirección.",
+        "Revisó: Blanca Katherin Gómez Viancha – Coordinadora de Formación.",
+        "Revisó: Eliana Cruz Mora - Líder de Bienestar.",
+        "Elaboró: Claudia Patricia Rincón Vija - Apoyo socioeconómico."
+    ]
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -0,0 +1,108 @@
+import importlib.util
+import os
+
+import pandas as pd
+
+from batch import APRENDIZ_FIELDS, Batch
+from upload_guard import RosterTooLarge
+
+# Columnas que debe traer todo listado de aprendices
+REQUIRED_COLUMNS = ['numero_documento', 'tipo_documento', 'nombres', 'apellidos', 'programa', 'ficha']
+
+# Columnas opcionales que se aprovechan si vienen en el archivo
+OPTIONAL_COLUMNS = ['fecha_nacimiento', 'telefono', 'email']
+
+ROSTER_COLUMNS = REQUIRED_COLUMNS + OPTIONAL_COLUMNS
+
+
+def _calamine_available():
+    """Indica si pandas puede usar el motor calamine (pandas >= 2.2 y python-calamine instalado)"""
+    if importlib.util.find_spec('python_calamine') is None:
+        return False
+    version = tuple(int(parte) for parte in pd.__version__.split('.')[:2])
+    return version >= (2, 2)
+
+
+def excel_engine(filepath):
+    """Selecciona el motor más rápido disponible para leer un archivo Excel"""
+    extension = os.path.splitext(filepath)[1].lower()
+    if _calamine_available():
+        return 'calamine'
+    if extension == '.xls':
+        return 'xlrd'
+    # pandas abre los .xlsx con openpyxl en modo read_only
+    return 'openpyxl'
+
+
+def _usecols(columna):
+    """Filtra las columnas del archivo a las requeridas y opcionales"""
+    return str(columna).strip() in ROSTER_COLUMNS
+
+
+def read_roster(filepath, engine=None, max_rows=None):
+    """Lee un listado de aprendices (CSV o Excel) como texto, solo con las columnas conocidas"""
+    # Se lee como máximo una fila de más para detectar listados que exceden el límite
+    nrows = max_rows + 1 if max_rows else None
+    if filepath.lower().endswith('.csv'):
+        df = pd.read_csv(filepath, encoding='utf-8', usecols=_usecols, dtype=str, nrows=nrows)
+    else:
+        df = pd.read_excel(filepath, engine=engine or excel_engine(filepath),
+                           usecols=_usecols, dtype=str, nrows=nrows)
+
+    if max_rows and len(df) > max_rows:
+        raise RosterTooLarge(f'El listado supera el máximo de {max_rows} filas')
+
+    df.columns = [str(columna).strip() for columna in df.columns]
+    return df
+
+
+def _texto(df, columna, upper=False, default=None):
+    """Normaliza una columna de texto: recorta espacios y convierte vacíos en el valor por defecto"""
+    if columna not in df.columns:
+        return [default] * len(df)
+    serie = df[columna].str.strip()
+    if upper:
+        serie = serie.str.upper()
+    return [default if pd.isna(valor) else valor for valor in serie.tolist()]
+
+
+def validate_roster(df):
+    """Revisa un listado sin escribir nada: columnas faltantes, filas incompletas y documentos repetidos"""
+    faltantes = [columna for columna in REQUIRED_COLUMNS if columna not in df.columns]
+    if faltantes:
+        return {'columnas_faltantes': faltantes, 'filas_incompletas': [], 'duplicados_archivo': {}}
+
+    incompletas = df[['numero_documento', 'nombres', 'apellidos']].isna().any(axis=1)
+    documentos = df['numero_documento'].str.strip()
+    repetidos = documentos.duplicated(keep=False) & ~incompletas
+
+    duplicados = {}
+    for index, documento in documentos[repetidos].items():
+        duplicados.setdefault(documento, []).append(index + 2)
+
+    return {
+        'columnas_faltantes': [],
+        'filas_incompletas': [index + 2 for index in df.index[incompletas].tolist()],
+        'duplicados_archivo': duplicados,
+    }
+
+
+def normalize_roster(df):
+    """Limpia el listado y lo convierte en un lote de aprendices por columnas"""
+    df = df.dropna(subset=['numero_documento', 'nombres', 'apellidos'])
+
+    lote = Batch(APRENDIZ_FIELDS)
+    lote.extend({
+        # Número de fila en la hoja (encabezado en la fila 1)
+        'fila': [index + 2 for index in df.index.tolist()],
+        'numero_documento': _texto(df, 'numero_documento'),
+        'tipo_documento': _texto(df, 'tipo_documento', default='CC'),
+        'nombres': _texto(df, 'nombres', upper=True),
+        'apellidos': _texto(df, 'apellidos', upper=True),
+        'programa': _texto(df, 'programa', default=''),
+        'ficha': _texto(df, 'ficha', default=''),
+        'fecha_nacimiento': _texto(df, 'fecha_nacimiento'),
+        'telefono': _texto(df, 'telefono'),
+        'email': _texto(df, 'email'),
+    })
+    return lote
@@ -1,22 +1,44 @@
+import json
+import logging
 import mysql.connector
 from mysql.connector import Error
-import os
-from datetime import datetime
+from migrations import ESTADISTICAS_REBUILD, apply_migrations
+from resolution_types import DEFAULT_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+class ResolucionDuplicada(Exception):
+    """El aprendiz ya tiene una resolución del tipo en el periodo"""
+
+    def __init__(self, numero_resolucion):
+        super().__init__(f'Ya tiene la resolución {numero_resolucion} del mismo tipo en el periodo')
+        self.numero_resolucion = numero_resolucion
+
 
 class DatabaseManager:
-    def __init__(self, host='localhost', database='sena_bienestar', user='root', password=''):
+    # Máximo de valores por cláusula IN en consultas por lote
+    IN_CHUNK_SIZE = 1000
+    
+    def __init__(self, host='localhost', database='sena_bienestar', user='root', password='', port=3306):
         self.host = host
         self.database = database
         self.user = user
         self.password = password
+        self.port = port
+    
+    def init_schema(self):
+        """Crea la base de datos, aplica las migraciones y carga las plantillas por defecto (comando init-db)"""
         self.ensure_database_exists()
-        self.create_tables()
+        self.migrate()
+        self.insert_default_templates()
     
     def ensure_database_exists(self):
         """Crea la base de datos si no existe"""
         try:
             connection = mysql.connector.connect(
                 host=self.host,
+                port=self.port,
                 user=self.user,
                 password=self.password
             )
@@ -25,15 +47,16 @@ class DatabaseManager:
             connection.commit()
             cursor.close()
             connection.close()
-            print(f"✅ Base de datos '{self.database}' creada/verificada")
+            logger.info("Base de datos '%s' creada/verificada", self.database)
         except Error as e:
-            print(f"❌ Error al crear la base de datos: {e}")
+            logger.error("Error al crear la base de datos: %s", e)
     
     def get_connection(self):
         """Obtiene conexión a la base de datos MySQL"""
         try:
             connection = mysql.connector.connect(
                 host=self.host,
+                port=self.port,
                 database=self.database,
                 user=self.user,
                 password=self.password,
@@ -41,108 +64,26 @@ class DatabaseManager:
             )
             return connection
         except Error as e:
-            print(f"❌ Error al conectar con MySQL: {e}")
+            logger.error("Error al conectar con MySQL: %s", e, extra={'evento': 'error_conexion'})
             return None
     
-    def create_tables(self):
-        """Crea las tablas necesarias en MySQL"""
+    def migrate(self):
+        """Aplica las migraciones pendientes del esquema"""
         connection = self.get_connection()
         if not connection:
             return
-            
-        cursor = connection.cursor()
         
         try:
-            # Tabla de aprendices
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS aprendices (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    numero_documento VARCHAR(20) UNIQUE NOT NULL,
-                    tipo_documento VARCHAR(5) NOT NULL,
-                    nombres VARCHAR(100) NOT NULL,
-                    apellidos VARCHAR(100) NOT NULL,
-                    programa VARCHAR(200) NOT NULL,
-                    ficha VARCHAR(20) NOT NULL,
-                    fecha_nacimiento DATE NULL,
-                    telefono VARCHAR(20) NULL,
-                    email VARCHAR(100) NULL,
-                    estado VARCHAR(20) DEFAULT 'ACTIVO',
-                    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    INDEX idx_numero_documento (numero_documento),
-                    INDEX idx_ficha (ficha),
-                    INDEX idx_estado (estado)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            ''')
-            
-            # Tabla de resoluciones
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS resoluciones (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    numero_resolucion VARCHAR(50) UNIQUE NOT NULL,
-                    tipo_resolucion VARCHAR(50) NOT NULL,
-                    aprendiz_id INT NOT NULL,
-                    contenido TEXT NOT NULL,
-                    fecha_generacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    estado VARCHAR(20) DEFAULT 'GENERADA',
-                    archivo_path VARCHAR(500) NULL,
-                    usuario_creacion VARCHAR(100) NULL,
-                    observaciones TEXT NULL,
-                    FOREIGN KEY (aprendiz_id) REFERENCES aprendices (id) ON DELETE CASCADE,
-                    INDEX idx_numero_resolucion (numero_resolucion),
-                    INDEX idx_tipo_resolucion (tipo_resolucion),
-                    INDEX idx_fecha_generacion (fecha_generacion)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            ''')
-            
-            # Tabla de plantillas
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS plantillas (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    nombre VARCHAR(200) NOT NULL,
-                    tipo VARCHAR(50) NOT NULL,
-                    descripcion TEXT NULL,
-                    contenido TEXT NOT NULL,
-                    variables TEXT NULL,
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                    activa BOOLEAN DEFAULT TRUE,
-                    usuario_creacion VARCHAR(100) NULL,
-                    INDEX idx_tipo (tipo),
-                    INDEX idx_activa (activa)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            ''')
-            
-            # Tabla de cargas masivas
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS cargas_masivas (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    nombre_archivo VARCHAR(255) NOT NULL,
-                    tipo_resolucion VARCHAR(50) NOT NULL,
-                    total_registros INT NOT NULL,
-                    registros_exitosos INT DEFAULT 0,
-                    registros_fallidos INT DEFAULT 0,
-                    fecha_carga TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    usuario_carga VARCHAR(100) NULL,
-                    estado VARCHAR(20) DEFAULT 'PROCESANDO',
-                    observaciones TEXT NULL,
-                    INDEX idx_tipo_resolucion (tipo_resolucion),
-                    INDEX idx_fecha_carga (fecha_carga),
-                    INDEX idx_estado (estado)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            ''')
-            
-            connection.commit()
-            print("✅ Tablas creadas exitosamente")
-            
+            aplicadas = apply_migrations(connection)
+            if aplicadas:
+                logger.info("Migraciones aplicadas: %s", ', '.join(str(v) for v in aplicadas))
+            else:
+                logger.info("Esquema al día, no hay migraciones pendientes")
         except Error as e:
-            print(f"❌ Error al crear tablas: {e}")
+            logger.error("Error al aplicar migraciones: %s", e)
             connection.rollback()
         finally:
-            cursor.close()
             connection.close()
-        
-        # Insertar plantillas por defecto
-        self.insert_default_templates()
     
     def insert_default_templates(self):
         """Inserta plantillas por defecto del SENA"""
@@ -158,91 +99,64 @@ class DatabaseManager:
             count = cursor.fetchone()[0]
             
             if count == 0:
-                plantillas_default = [
-                    {
-                        'nombre': 'Resolución de Apoyo de Sostenimiento FIC',
-                        'tipo': 'APOYO_SOSTENIMIENTO',
-                        'descripcion': 'Resolución para otorgar apoyo de sostenimiento del Fondo de la Industria de la Construcción',
-                        'contenido': '''ARTÍCULO 1°: Otorgar apoyo de sostenimiento FIC al aprendiz {nombres} {apellidos}, identificado con {tipo_documento} No. {numero_documento}, quien se encuentra matriculado en el programa de formación {programa}, ficha {ficha}, del Centro Minero SENA Regional Boyacá.
-
-ARTÍCULO 2°: El presente apoyo se otorga por el período académico correspondiente al programa de formación matriculado, de conformidad con la normatividad vigente y los recursos presupuestales disponibles.
-
-ARTÍCULO 3°: La presente resolución rige a partir de la fecha de su expedición.''',
-                        'variables': 'numero_resolucion,nombres,apellidos,tipo_documento,numero_documento,programa,ficha,ciudad,dia,mes,año'
-                    },
-                    {
-                        'nombre': 'Resolución de Apoyo de Transporte',
-                        'tipo': 'TRANSPORTE',
-                        'descripcion': 'Resolución para otorgar apoyo de transporte a aprendices',
-                        'contenido': '''ARTÍCULO 1°: Otorgar apoyo de transporte al aprendiz {nombres} {apellidos}, identificado con {tipo_documento} No. {numero_documento}, matriculado en el programa {programa}, ficha {ficha}.
-
-ARTÍCULO 2°: El apoyo se otorga para facilitar el desplazamiento desde su lugar de residencia hasta el Centro de Formación y viceversa, durante el período de formación.
-
-ARTÍCULO 3°: La presente resolución rige a partir de la fecha de su expedición.''',
-                        'variables': 'numero_resolucion,nombres,apellidos,tipo_documento,numero_documento,programa,ficha'
-                    },
-                    {
-                        'nombre': 'Resolución de Monitoria Académica',
-                        'tipo': 'MONITORIA',
-                        'descripcion': 'Resolución para designar monitores académicos por excelencia',
-                        'contenido': '''ARTÍCULO 1°: Designar como monitor académico al aprendiz {nombres} {apellidos}, identificado con {tipo_documento} No. {numero_documento}, del programa {programa}, ficha {ficha}.
-
-ARTÍCULO 2°: Las actividades de monitoria se desarrollarán bajo la supervisión del Coordinador Académico y tendrán una duración de cuatro (4) meses.
-
-ARTÍCULO 3°: El monitor recibirá un estímulo económico mensual equivalente al 50% del salario mínimo legal vigente.
-
-ARTÍCULO 4°: La presente resolución rige a partir de la fecha de su expedición.''',
-                        'variables': 'numero_resolucion,nombres,apellidos,tipo_documento,numero_documento,programa,ficha'
-                    }
-                ]
-                
-                for plantilla in plantillas_default:
+                for plantilla in DEFAULT_TYPES:
                     cursor.execute('''
-                        INSERT INTO plantillas (nombre, tipo, descripcion, contenido, variables, usuario_creacion)
-                        VALUES (%s, %s, %s, %s, %s, %s)
+                        INSERT INTO plantillas (nombre, tipo, descripcion, subtitulo, considerandos,
+                                                contenido, variables, usuario_creacion)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                     ''', (plantilla['nombre'], plantilla['tipo'], plantilla['descripcion'],
-                         plantilla['contenido'], plantilla['variables'], 'SISTEMA'))
+                          plantilla['subtitulo'], json.dumps(plantilla['considerandos'], ensure_ascii=False),
+                          plantilla['contenido'], plantilla['variables'], 'SISTEMA'))
                 
                 connection.commit()
-                print("✅ Plantillas por defecto insertadas")
+                logger.info("Plantillas por defecto insertadas")
                 
         except Error as e:
-            print(f"❌ Error al insertar plantillas: {e}")
+            logger.error("Error al insertar plantillas: %s", e)
             connection.rollback()
         finally:
             cursor.close()
             connection.close()
     
     def insert_aprendiz(self, datos):
-        """Inserta un nuevo aprendiz"""
+        """Inserta un aprendiz si no existe; devuelve (id, nuevo) o (None, False) si falla"""
         connection = self.get_connection()
         if not connection:
-            return None
+            return None, False
             
         cursor = connection.cursor()
         
         try:
+            # Si el documento ya está registrado, LAST_INSERT_ID(id) devuelve el id existente
+            # y la fila no cambia (rowcount 0)
             cursor.execute('''
                 INSERT INTO aprendices 
                 (numero_documento, tipo_documento, nombres, apellidos, programa, ficha, 
                  fecha_nacimiento, telefono, email)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
             ''', (
                 datos['numero_documento'], datos['tipo_documento'], 
                 datos['nombres'], datos['apellidos'], datos['programa'], 
                 datos['ficha'], datos.get('fecha_nacimiento'), 
                 datos.get('telefono'), datos.get('email')
             ))
+            aprendiz_id = cursor.lastrowid
+            nuevo = cursor.rowcount == 1
+            
+            if nuevo:
+                cursor.execute('''
+                    INSERT INTO estadisticas (dimension, clave, total) VALUES ('aprendices', 'total', 1)
+                    ON DUPLICATE KEY UPDATE total = total + 1
+                ''')
             
             connection.commit()
-            aprendiz_id = cursor.lastrowid
-            return aprendiz_id
+            return aprendiz_id, nuevo
             
-        except mysql.connector.IntegrityError:
-            return None
         except Error as e:
-            print(f"❌ Error al insertar aprendiz: {e}")
-            return None
+            logger.error("Error al insertar aprendiz %s: %s", datos['numero_documento'], e,
+                         extra={'evento': 'error_insertar_aprendiz'})
+            return None, False
         finally:
             cursor.close()
             connection.close()
@@ -260,12 +174,34 @@ ARTÍCULO 4°: La presente resolución rige a partir de la fecha de su expedici
             plantillas = cursor.fetchall()
             return plantillas
         except Error as e:
-            print(f"❌ Error al obtener plantillas por tipo: {e}")
+            logger.error("Error al obtener plantillas por tipo: %s", e)
             return []
         finally:
             cursor.close()
             connection.close()
     
+    def get_plantilla(self, tipo):
+        """Obtiene la primera plantilla activa de un tipo como diccionario"""
+        connection = self.get_connection()
+        if not connection:
+            return None
+            
+        cursor = connection.cursor(dictionary=True)
+        
+        try:
+            cursor.execute('''
+                SELECT id, nombre, tipo, descripcion, subtitulo, considerandos, contenido, variables
+                FROM plantillas WHERE tipo = %s AND activa = TRUE
+                ORDER BY id LIMIT 1
+            ''', (tipo,))
+            return cursor.fetchone()
+        except Error as e:
+            logger.error("Error al obtener la plantilla: %s", e)
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+    
     def insert_carga_masiva(self, nombre_archivo, tipo_resolucion, total_registros, usuario='SISTEMA'):
         """Registra una carga masiva"""
         connection = self.get_connection()
@@ -280,13 +216,21 @@ ARTÍCULO 4°: La presente resolución rige a partir de la fecha de su expedici
                 (nombre_archivo, tipo_resolucion, total_registros, usuario_carga)
                 VALUES (%s, %s, %s, %s)
             ''', (nombre_archivo, tipo_resolucion, total_registros, usuario))
+            carga_id = cursor.lastrowid
+            
+            # Toda carga registrada cuenta, aunque no llegue a actualizarse (queda en PROCESANDO)
+            cursor.execute('''
+                INSERT INTO estadisticas (dimension, clave, total) VALUES
+                    ('cargas', 'total', 1),
+                    ('cargas_estado', 'PROCESANDO', 1)
+                ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+            ''')
             
             connection.commit()
-            carga_id = cursor.lastrowid
             return carga_id
             
         except Error as e:
-            print(f"❌ Error al registrar carga masiva: {e}")
+            logger.error("Error al registrar carga masiva: %s", e)
             return None
         finally:
             cursor.close()
@@ -301,24 +245,46 @@ ARTÍCULO 4°: La presente resolución rige a partir de la fecha de su expedici
         cursor = connection.cursor()
         
         try:
+            # Valores previos, bloqueando la fila, para ajustar las estadísticas por diferencia
+            cursor.execute('''
+                SELECT estado, registros_exitosos, registros_fallidos FROM cargas_masivas
+                WHERE id = %s FOR UPDATE
+            ''', (carga_id,))
+            previo = cursor.fetchone()
+            if previo is None:
+                connection.rollback()
+                return False
+            estado_previo, exitosos_previos, fallidos_previos = previo
+            
             cursor.execute('''
                 UPDATE cargas_masivas 
                 SET registros_exitosos = %s, registros_fallidos = %s, estado = %s
                 WHERE id = %s
             ''', (exitosos, fallidos, estado, carga_id))
             
+            # Mantener las estadísticas en la misma transacción; la carga ya se contó al registrarla
+            cursor.execute('''
+                INSERT INTO estadisticas (dimension, clave, total) VALUES
+                    ('cargas_estado', %s, -1),
+                    ('cargas_estado', %s, 1),
+                    ('registros', 'exitosos', %s),
+                    ('registros', 'fallidos', %s)
+                ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+            ''', (estado_previo, estado, exitosos - (exitosos_previos or 0), fallidos - (fallidos_previos or 0)))
+            
             connection.commit()
             return True
             
         except Error as e:
-            print(f"❌ Error al actualizar carga masiva: {e}")
+            logger.error("Error al actualizar carga masiva: %s", e)
             return False
         finally:
             cursor.close()
             connection.close()
     
-    def insert_resolucion(self, numero_resolucion, tipo_resolucion, aprendiz_id, contenido, archivo_path=None):
-        """Inserta una nueva resolución"""
+    def insert_resolucion(self, numero_resolucion, tipo_resolucion, aprendiz_id, contenido, archivo_path=None,
+                          desde=None, hasta=None):
+        """Inserta una nueva resolución; con desde/hasta lanza ResolucionDuplicada si ya hay una del tipo en el rango"""
         connection = self.get_connection()
         if not connection:
             return None
@@ -326,19 +292,423 @@ ARTÍCULO 4°: La presente resolución rige a partir de la fecha de su expedici
         cursor = connection.cursor()
         
         try:
+            if desde is not None:
+                # El bloqueo de la fila del aprendiz serializa, entre procesos, la verificación y
+                # la inserción de sus resoluciones hasta el commit
+                cursor.execute('SELECT id FROM aprendices WHERE id = %s FOR UPDATE', (aprendiz_id,))
+                cursor.fetchall()
+                cursor.execute('''
+                    SELECT numero_resolucion FROM resoluciones
+                    WHERE aprendiz_id = %s AND tipo_resolucion = %s
+                      AND fecha_generacion >= %s AND fecha_generacion < %s
+                    LIMIT 1 FOR UPDATE
+                ''', (aprendiz_id, tipo_resolucion, desde, hasta))
+                existente = cursor.fetchone()
+                if existente:
+                    connection.rollback()
+                    raise ResolucionDuplicada(existente[0])
+            
             cursor.execute('''
                 INSERT INTO resoluciones 
                 (numero_resolucion, tipo_resolucion, aprendiz_id, contenido, archivo_path)
                 VALUES (%s, %s, %s, %s, %s)
             ''', (numero_resolucion, tipo_resolucion, aprendiz_id, contenido, archivo_path))
+            resolucion_id = cursor.lastrowid
+            
+            # Mantener las estadísticas en la misma transacción. El conector solo sustituye %s:
+            # el formato de DATE_FORMAT va con un solo % (con %% MySQL recibiría un % literal)
+            cursor.execute('''
+                INSERT INTO estadisticas (dimension, clave, total) VALUES
+                    ('tipo', %s, 1),
+                    ('mes', DATE_FORMAT(CURRENT_TIMESTAMP, '%Y-%m'), 1),
+                    ('programa', (SELECT programa FROM aprendices WHERE id = %s), 1),
+                    ('ficha', (SELECT ficha FROM aprendices WHERE id = %s), 1)
+                ON DUPLICATE KEY UPDATE total = total + 1
+            ''', (tipo_resolucion, aprendiz_id, aprendiz_id))
             
             connection.commit()
-            resolucion_id = cursor.lastrowid
             return resolucion_id
             
         except Error as e:
-            print(f"❌ Error al insertar resolución: {e}")
+            logger.error("Error al insertar resolución %s: %s", numero_resolucion, e,
+                         extra={'evento': 'error_insertar_resolucion'})
             return None
         finally:
             cursor.close()
-            connection.close()
\ No newline at end of file
+            connection.close()
+    
+    def get_resoluciones_existentes(self, numeros_documento, tipo_resolucion, desde, hasta):
+        """Obtiene las resoluciones del tipo ya emitidas en el periodo para un grupo de aprendices"""
+        existentes = {}
+        if not numeros_documento:
+            return existentes
+        
+        connection = self.get_connection()
+        if not connection:
+            return existentes
+            
+        cursor = connection.cursor()
+        
+        try:
+            documentos = list(dict.fromkeys(numeros_documento))
+            for inicio in range(0, len(documentos), self.IN_CHUNK_SIZE):
+                bloque = documentos[inicio:inicio + self.IN_CHUNK_SIZE]
+                marcadores = ', '.join(['%s'] * len(bloque))
+                cursor.execute(f'''
+                    SELECT a.numero_documento, r.numero_resolucion
+                    FROM aprendices a
+                    JOIN resoluciones r ON r.aprendiz_id = a.id
+                    WHERE a.numero_documento IN ({marcadores})
+                      AND r.tipo_resolucion = %s
+                      AND r.fecha_generacion >= %s AND r.fecha_generacion < %s
+                ''', (*bloque, tipo_resolucion, desde, hasta))
+                for numero_documento, numero_resolucion in cursor.fetchall():
+                    existentes[numero_documento] = numero_resolucion
+            return existentes
+            
+        except Error as e:
+            logger.error("Error al consultar resoluciones existentes: %s", e)
+            return existentes
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_aprendices_existentes(self, numeros_documento):
+        """Obtiene cuáles de los documentos ya están registrados como aprendices"""
+        existentes = set()
+        if not numeros_documento:
+            return existentes
+
+        connection = self.get_connection()
+        if not connection:
+            return existentes
+
+        cursor = connection.cursor()
+
+        try:
+            documentos = list(dict.fromkeys(numeros_documento))
+            for inicio in range(0, len(documentos), self.IN_CHUNK_SIZE):
+                bloque = documentos[inicio:inicio + self.IN_CHUNK_SIZE]
+                marcadores = ', '.join(['%s'] * len(bloque))
+                cursor.execute(f'''
+                    SELECT numero_documento FROM aprendices
+                    WHERE numero_documento IN ({marcadores})
+                ''', bloque)
+                existentes.update(numero_documento for (numero_documento,) in cursor.fetchall())
+            return existentes
+
+        except Error as e:
+            logger.error("Error al consultar aprendices existentes: %s", e)
+            return existentes
+        finally:
+            cursor.close()
+            connection.close()
+
+    def register_archivos(self, archivos):
+        """Registra archivos generados o cargados: lista de (ruta, lote, categoria, tamano)"""
+        if not archivos:
+            return True
+        
+        connection = self.get_connection()
+        if not connection:
+            return False
+            
+        cursor = connection.cursor()
+        
+        try:
+            cursor.executemany('''
+                INSERT INTO archivos_generados (ruta, lote, categoria, tamano)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE tamano = VALUES(tamano), fecha_creacion = CURRENT_TIMESTAMP
+            ''', archivos)
+            
+            connection.commit()
+            return True
+            
+        except Error as e:
+            logger.error("Error al registrar archivos: %s", e)
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def get_archivos_para_eliminar(self, fecha_limite, max_bytes, limite=1000):
+        """Obtiene las rutas vencidas y, si se supera la cuota, las más antiguas hasta liberarla"""
+        connection = self.get_connection()
+        if not connection:
+            return []
+            
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT ruta FROM archivos_generados
+                WHERE fecha_creacion < %s
+                ORDER BY fecha_creacion
+                LIMIT %s
+            ''', (fecha_limite, limite))
+            rutas = [row[0] for row in cursor.fetchall()]
+            
+            cursor.execute('SELECT COALESCE(SUM(tamano), 0) FROM archivos_generados WHERE fecha_creacion >= %s',
+                           (fecha_limite,))
+            exceso = int(cursor.fetchone()[0]) - max_bytes
+            
+            if exceso > 0:
+                cursor.execute('''
+                    SELECT ruta, tamano FROM archivos_generados
+                    WHERE fecha_creacion >= %s
+                    ORDER BY fecha_creacion
+                    LIMIT %s
+                ''', (fecha_limite, limite))
+                for ruta, tamano in cursor.fetchall():
+                    if exceso <= 0:
+                        break
+                    rutas.append(ruta)
+                    exceso -= tamano
+            return rutas
+            
+        except Error as e:
+            logger.error("Error al consultar archivos para eliminar: %s", e)
+            return []
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def delete_archivos(self, rutas):
+        """Elimina el registro de archivos ya borrados del disco"""
+        if not rutas:
+            return True
+        
+        connection = self.get_connection()
+        if not connection:
+            return False
+            
+        cursor = connection.cursor()
+        
+        try:
+            for inicio in range(0, len(rutas), self.IN_CHUNK_SIZE):
+                bloque = rutas[inicio:inicio + self.IN_CHUNK_SIZE]
+                marcadores = ', '.join(['%s'] * len(bloque))
+                cursor.execute(f'DELETE FROM archivos_generados WHERE ruta IN ({marcadores})', bloque)
+            
+            connection.commit()
+            return True
+            
+        except Error as e:
+            logger.error("Error al eliminar registro de archivos: %s", e)
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def get_resolucion(self, resolucion_id):
+        """Obtiene número y ruta del archivo de una resolución"""
+        connection = self.get_connection()
+        if not connection:
+            return None
+            
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('SELECT numero_resolucion, archivo_path FROM resoluciones WHERE id = %s', (resolucion_id,))
+            return cursor.fetchone()
+        except Error as e:
+            logger.error("Error al obtener resolución: %s", e)
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def iter_resoluciones_export(self, tipo_resolucion=None, desde=None, hasta=None, ficha=None, batch_size=1000):
+        """Recorre las resoluciones con los datos del aprendiz usando un cursor sin búfer (memoria constante)"""
+        connection = self.get_connection()
+        if not connection:
+            return
+            
+        # Cursor sin búfer: las filas se leen del servidor a medida que se consumen
+        cursor = connection.cursor(buffered=False)
+        
+        condiciones = []
+        parametros = []
+        if tipo_resolucion:
+            condiciones.append('r.tipo_resolucion = %s')
+            parametros.append(tipo_resolucion)
+        if desde:
+            condiciones.append('r.fecha_generacion >= %s')
+            parametros.append(desde)
+        if hasta:
+            condiciones.append('r.fecha_generacion < %s')
+            parametros.append(hasta)
+        if ficha:
+            condiciones.append('a.ficha = %s')
+            parametros.append(ficha)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        
+        try:
+            cursor.execute(f'''
+                SELECT r.numero_resolucion, r.tipo_resolucion, r.fecha_generacion, r.estado,
+                       a.tipo_documento, a.numero_documento, a.nombres, a.apellidos, a.programa, a.ficha
+                FROM resoluciones r
+                JOIN aprendices a ON a.id = r.aprendiz_id
+                {where}
+                ORDER BY r.fecha_generacion, r.id
+            ''', parametros)
+            
+            while True:
+                filas = cursor.fetchmany(batch_size)
+                if not filas:
+                    break
+                yield from filas
+                
+        except Error as e:
+            # Se propaga para abortar la descarga en lugar de entregar un archivo truncado
+            logger.error("Error al exportar resoluciones: %s", e)
+            raise
+        finally:
+            # Si el consumidor abandona el recorrido quedan filas sin leer y cerrar el cursor
+            # falla ("Unread result found"); la conexión se cierra de todos modos
+            try:
+                cursor.close()
+            except Error:
+                pass
+            finally:
+                connection.close()
+
+    
+    def refresh_estadisticas(self):
+        """Recalcula las estadísticas agregadas desde las tablas (comando refresh-stats)"""
+        connection = self.get_connection()
+        if not connection:
+            return False
+            
+        cursor = connection.cursor()
+        
+        try:
+            for sentencia in ESTADISTICAS_REBUILD:
+                cursor.execute(sentencia)
+            
+            connection.commit()
+            return True
+            
+        except Error as e:
+            logger.error("Error al recalcular estadísticas: %s", e)
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def get_estadisticas(self):
+        """Obtiene las estadísticas agregadas agrupadas por dimensión"""
+        connection = self.get_connection()
+        if not connection:
+            return {}
+            
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('SELECT dimension, clave, total FROM estadisticas')
+            estadisticas = {}
+            for dimension, clave, total in cursor.fetchall():
+                estadisticas.setdefault(dimension, {})[clave] = int(total)
+            return estadisticas
+        except Error as e:
+            logger.error("Error al obtener estadísticas: %s", e)
+            return {}
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def save_blob(self, clave, partes):
+        """Guarda un documento por partes (reemplaza la versión anterior en la misma transacción)"""
+        connection = self.get_connection()
+        if not connection:
+            return False
+            
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('DELETE FROM documentos_blob WHERE clave = %s', (clave,))
+            tamano = 0
+            numero = 0
+            for numero, parte in enumerate(partes, 1):
+                cursor.execute('INSERT INTO documentos_blob (clave, parte, datos) VALUES (%s, %s, %s)',
+                               (clave, numero, parte))
+                tamano += len(parte)
+            
+            cursor.execute('''
+                INSERT INTO documentos (clave, tamano, partes) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE tamano = VALUES(tamano), partes = VALUES(partes),
+                                        fecha_actualizacion = CURRENT_TIMESTAMP
+            ''', (clave, tamano, numero))
+            
+            connection.commit()
+            return True
+            
+        except Error as e:
+            logger.error("Error al guardar documento %s: %s", clave, e)
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def iter_blob(self, clave):
+        """Recorre las partes de un documento sin cargarlo completo en memoria"""
+        connection = self.get_connection()
+        if not connection:
+            return
+            
+        cursor = connection.cursor(buffered=False)
+        
+        try:
+            cursor.execute('SELECT datos FROM documentos_blob WHERE clave = %s ORDER BY parte', (clave,))
+            for (datos,) in cursor:
+                yield bytes(datos)
+        except Error as e:
+            logger.error("Error al leer documento %s: %s", clave, e)
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def get_blob_stat(self, clave):
+        """Obtiene (tamaño, fecha de actualización en segundos) de un documento"""
+        connection = self.get_connection()
+        if not connection:
+            return None
+            
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('SELECT tamano, UNIX_TIMESTAMP(fecha_actualizacion) FROM documentos WHERE clave = %s',
+                           (clave,))
+            fila = cursor.fetchone()
+            return (int(fila[0]), float(fila[1])) if fila else None
+        except Error as e:
+            logger.error("Error al consultar documento %s: %s", clave, e)
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def delete_blob(self, clave):
+        """Elimina un documento y sus partes"""
+        connection = self.get_connection()
+        if not connection:
+            return False
+            
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('DELETE FROM documentos_blob WHERE clave = %s', (clave,))
+            cursor.execute('DELETE FROM documentos WHERE clave = %s', (clave,))
+            connection.commit()
+            return True
+        except Error as e:
+            logger.error("Error al eliminar documento %s: %s", clave, e)
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
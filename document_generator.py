@@ -1,19 +1,56 @@
 from docx import Document
 from docx.shared import Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from collections import Counter, defaultdict
 from datetime import datetime
+from xml.sax.saxutils import escape
 import os
-import re
+import uuid
 
 class DocumentGenerator:
-    def __init__(self, output_dir='generated'):
+    def __init__(self, output_dir='generated', storage=None, firma=None):
         self.output_dir = output_dir
+        # Backend donde se publican los documentos (ver storage.py); None los deja solo en disco local
+        self.storage = storage
+        # Bloque de firma: {'nombre', 'cargo', 'revisiones'} tomado de la configuración
+        self.firma = firma or {}
         self.ensure_output_dir()
     
     def ensure_output_dir(self):
         """Crea el directorio de salida si no existe"""
         os.makedirs(self.output_dir, exist_ok=True)
     
+    def storage_key(self, filepath):
+        """Llave de almacenamiento de un archivo: su ruta relativa a la carpeta de salida"""
+        return os.path.relpath(filepath, self.output_dir).replace(os.sep, '/')
+    
+    def publish(self, filepaths, max_workers=4):
+        """Publica en paralelo los archivos en el backend; devuelve por archivo None o el error ocurrido"""
+        if self.storage is None:
+            return [None] * len(filepaths)
+        items = [(self.storage_key(filepath), filepath) for filepath in filepaths]
+        return self.storage.save_many(items, max_workers)
+    
+    def _save_atomic(self, doc, filepath):
+        """Guarda el documento en un temporal del mismo directorio y lo renombra al destino"""
+        temporal = f"{filepath}.{uuid.uuid4().hex}.tmp"
+        try:
+            doc.save(temporal)
+            os.replace(temporal, filepath)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        return filepath
+    
+    def _output_path(self, filename, subdir=None):
+        """Ruta de salida de un archivo, dentro del subdirectorio del lote si se indica"""
+        directorio = os.path.join(self.output_dir, subdir) if subdir else self.output_dir
+        os.makedirs(directorio, exist_ok=True)
+        return os.path.join(directorio, filename)
+    
     def get_month_name(self, month_number):
         """Convierte número de mes a nombre en español"""
         months = [
@@ -22,8 +59,8 @@ class DocumentGenerator:
         ]
         return months[month_number]
     
-    def generate_resolution(self, aprendiz_data, plantilla_data, numero_resolucion):
-        """Genera una resolución en formato Word según estándar SENA"""
+    def generate_resolution(self, aprendiz_data, tipo_resolucion, numero_resolucion, subdir=None):
+        """Genera una resolución en formato Word según estándar SENA (tipo_resolucion: ResolutionType)"""
         
         # Crear documento
         doc = Document()
@@ -79,15 +116,8 @@ class DocumentGenerator:
         titulo_run.font.size = 14
         
         # Subtítulo según tipo de resolución
-        if plantilla_data['tipo'] == 'APOYO_SOSTENIMIENTO':
-            subtitulo = f'Por la cual se otorga apoyo de sostenimiento al aprendiz {datos_reemplazo["nombres"]} {datos_reemplazo["apellidos"]}'
-        elif plantilla_data['tipo'] == 'TRANSPORTE':
-            subtitulo = f'Por la cual se otorga apoyo de transporte al aprendiz {datos_reemplazo["nombres"]} {datos_reemplazo["apellidos"]}'
-        elif plantilla_data['tipo'] == 'MONITORIA':
-            subtitulo = f'Por la cual se designa como monitor académico al aprendiz {datos_reemplazo["nombres"]} {datos_reemplazo["apellidos"]}'
-        else:
-            subtitulo = plantilla_data.get('descripcion', 'Resolución administrativa')
-            
+        subtitulo = tipo_resolucion.subtitulo.render(datos_reemplazo)
+        
         subtitulo_para = doc.add_paragraph()
         subtitulo_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
         subtitulo_run = subtitulo_para.add_run(subtitulo)
@@ -122,7 +152,7 @@ class DocumentGenerator:
         considerando_run.font.size = 12
         
         # Agregar considerandos específicos según el tipo
-        self._agregar_considerandos(doc, plantilla_data['tipo'])
+        self._agregar_considerandos(doc, tipo_resolucion.considerandos)
         
         # RESUELVE
         doc.add_paragraph()
@@ -131,87 +161,42 @@ class DocumentGenerator:
         resuelve_run.bold = True
         resuelve_run.font.size = 12
         
-        # Procesar contenido de la plantilla y reemplazar variables
-        contenido = plantilla_data['contenido']
-        for variable, valor in datos_reemplazo.items():
-            contenido = contenido.replace(f'{{{variable}}}', str(valor))
-        
-        # Agregar artículos
-        self._agregar_articulos(doc, contenido, datos_reemplazo)
+        # Agregar artículos con las variables de la plantilla reemplazadas
+        self._agregar_articulos(doc, tipo_resolucion.articulos, datos_reemplazo)
         
         # Pie de resolución
         self._agregar_pie_resolucion(doc, datos_reemplazo)
         
         # Generar nombre de archivo
         filename = f"resolucion_{numero_resolucion.replace('-', '_')}_{aprendiz_data['numero_documento']}.docx"
-        filepath = os.path.join(self.output_dir, filename)
+        filepath = self._output_path(filename, subdir)
         
         # Guardar documento
-        doc.save(filepath)
+        self._save_atomic(doc, filepath)
         
         return filepath
     
-    def _agregar_considerandos(self, doc, tipo_resolucion):
-        """Agrega los considerandos específicos según el tipo de resolución"""
-        
-        considerandos_base = [
-            'Que el artículo 6º del Decreto 2375 de 1974 establece la creación del Fondo Nacional de Formación Profesional de la Industria de la Construcción.',
-            'Que el SENA tiene la responsabilidad de administrar los recursos destinados al bienestar de los aprendices.',
-            'Que es necesario garantizar el apoyo a los aprendices durante su proceso de formación.'
-        ]
-        
-        # Agregar considerandos específicos según el tipo
-        if tipo_resolucion == 'APOYO_SOSTENIMIENTO':
-            considerandos_especificos = [
-                'Que el aprendiz cumple con los requisitos establecidos para el otorgamiento del apoyo de sostenimiento.',
-                'Que existe disponibilidad presupuestal para atender la solicitud.'
-            ]
-        elif tipo_resolucion == 'TRANSPORTE':
-            considerandos_especificos = [
-                'Que se requiere facilitar el desplazamiento del aprendiz hacia el centro de formación.',
-                'Que el apoyo de transporte contribuye a la permanencia en el programa formativo.'
-            ]
-        elif tipo_resolucion == 'MONITORIA':
-            considerandos_especificos = [
-                'Que el aprendiz ha demostrado excelencia académica y competencias para ejercer monitoria.',
-                'Que la monitoria académica fortalece el proceso de formación integral.'
-            ]
-        else:
-            considerandos_especificos = []
-        
-        # Agregar todos los considerandos al documento
-        for considerando in considerandos_base + considerandos_especificos:
+    def _agregar_considerandos(self, doc, considerandos):
+        """Agrega los considerandos comunes y los específicos del tipo de resolución"""
+        for considerando in considerandos:
             para = doc.add_paragraph()
             para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
             para.add_run(considerando)
             para.space_after = 6
     
-    def _agregar_articulos(self, doc, contenido, datos_reemplazo):
-        """Agrega los artículos de la resolución"""
-        
-        # Dividir contenido en artículos
-        articulos = contenido.split('ARTÍCULO')
-        
-        for i, articulo in enumerate(articulos):
-            if articulo.strip():
-                art_para = doc.add_paragraph()
-                if i == 0:
-                    # Primer artículo
-                    art_run = art_para.add_run("ARTÍCULO " + articulo.strip())
-                else:
-                    art_run = art_para.add_run("ARTÍCULO" + articulo.strip())
-                
-                # Hacer negrita la palabra ARTÍCULO y el número
-                art_text = art_run.text
-                if ":" in art_text:
-                    parts = art_text.split(":", 1)
-                    art_para.clear()
-                    bold_part = art_para.add_run(parts[0] + ":")
-                    bold_part.bold = True
-                    art_para.add_run(" " + parts[1].strip())
-                
-                art_para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-                art_para.space_after = 12
+    def _agregar_articulos(self, doc, articulos, datos_reemplazo):
+        """Agrega los artículos de la resolución (encabezado en negrita y cuerpo con las variables)"""
+        for encabezado, cuerpo in articulos:
+            art_para = doc.add_paragraph()
+            if encabezado:
+                bold_part = art_para.add_run(encabezado)
+                bold_part.bold = True
+                art_para.add_run(" " + cuerpo.render(datos_reemplazo))
+            else:
+                art_para.add_run(cuerpo.render(datos_reemplazo))
+            
+            art_para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+            art_para.space_after = 12
     
     def _agregar_pie_resolucion(self, doc, datos_reemplazo):
         """Agrega el pie de la resolución con firmas y datos"""
@@ -240,29 +225,40 @@ class DocumentGenerator:
         # Nombre del firmante
         nombre_para = doc.add_paragraph()
         nombre_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        nombre_run = nombre_para.add_run("Harvey Yadiver Dimaté Rodríguez")
+        nombre_run = nombre_para.add_run(self.firma.get('nombre', ''))
         nombre_run.bold = True
         
         # Cargo
         cargo_para = doc.add_paragraph()
         cargo_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        cargo_para.add_run("Subdirector (E) Centro Minero")
+        cargo_para.add_run(self.firma.get('cargo', ''))
         
         # Revisiones
         doc.add_paragraph("\n")
-        revisiones = [
-            "VoBo: Julieth Alejandra Viancha Torres: Jurídica Subdirección.",
-            "Revisó: Blanca Katherin Gómez Viancha – Coordinadora de Formación.",
-            "Revisó: Eliana Cruz Mora - Líder de Bienestar.",
-            "Elaboró: Claudia Patricia Rincón Vija - Apoyo socioeconómico."
-        ]
-        
-        for revision in revisiones:
+        for revision in self.firma.get('revisiones', []):
             rev_para = doc.add_paragraph()
             rev_para.add_run(revision)
             rev_para.space_after = 6
     
-    def create_batch_summary(self, generated_files):
+    def _agregar_tabla(self, doc, encabezados, filas):
+        """Agrega una tabla construyendo su XML en una sola pasada (lineal en el número de filas)"""
+        def celda(texto, negrita=False):
+            run_pr = '<w:rPr><w:b/></w:rPr>' if negrita else ''
+            return (f'<w:tc><w:tcPr><w:tcW w:w="0" w:type="auto"/></w:tcPr>'
+                    f'<w:p><w:r>{run_pr}<w:t xml:space="preserve">{escape(str(texto))}</w:t></w:r></w:p></w:tc>')
+        
+        partes = [
+            f'<w:tbl {nsdecls("w")}>',
+            '<w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="0" w:type="auto"/></w:tblPr>',
+            '<w:tblGrid>' + '<w:gridCol/>' * len(encabezados) + '</w:tblGrid>',
+            '<w:tr>' + ''.join(celda(texto, negrita=True) for texto in encabezados) + '</w:tr>',
+        ]
+        partes.extend('<w:tr>' + ''.join(celda(texto) for texto in fila) + '</w:tr>' for fila in filas)
+        partes.append('</w:tbl>')
+        
+        doc.element.body.sectPr.addprevious(parse_xml(''.join(partes)))
+    
+    def create_batch_summary(self, generated_files, subdir=None):
         """Crea un resumen de generación masiva"""
         doc = Document()
         
@@ -274,39 +270,56 @@ class DocumentGenerator:
         fecha_generacion = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
         doc.add_paragraph(f'Fecha de generación: {fecha_generacion}')
         
+        # Totales y desgloses por tipo y por ficha, calculados en un solo recorrido
+        totales = Counter()
+        por_tipo = defaultdict(Counter)
+        por_ficha = defaultdict(Counter)
+        duracion_total = 0
+        for file_info in generated_files:
+            status = file_info['status']
+            totales[status] += 1
+            por_tipo[file_info.get('tipo_resolucion', '')][status] += 1
+            por_ficha[file_info.get('ficha', '')][status] += 1
+            duracion_total += file_info.get('duracion_ms', 0)
+        
         total_files = len(generated_files)
-        successful_files = len([f for f in generated_files if f['status'] == 'success'])
-        failed_files = total_files - successful_files
+        successful_files = totales['success']
+        duplicate_files = totales['duplicado']
+        failed_files = total_files - successful_files - duplicate_files
         
         doc.add_paragraph(f'Total de resoluciones: {total_files}')
         doc.add_paragraph(f'Generadas exitosamente: {successful_files}')
+        doc.add_paragraph(f'Omitidas por duplicado: {duplicate_files}')
         doc.add_paragraph(f'Fallidas: {failed_files}')
+        doc.add_paragraph(f'Tiempo total de generación: {duracion_total / 1000:.1f} s')
+        if successful_files:
+            doc.add_paragraph(f'Tiempo promedio por resolución: {duracion_total / successful_files:.0f} ms')
         
-        # Tabla de resultados
-        doc.add_heading('Detalle de Resoluciones', level=1)
+        encabezados_desglose = ['Total', 'Exitosas', 'Duplicadas', 'Fallidas']
         
-        table = doc.add_table(rows=1, cols=4)
-        table.style = 'Table Grid'
+        def desglose(conteos):
+            total = sum(conteos.values())
+            return [total, conteos['success'], conteos['duplicado'], total - conteos['success'] - conteos['duplicado']]
         
-        # Encabezados
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Aprendiz'
-        hdr_cells[1].text = 'Documento'
-        hdr_cells[2].text = 'No. Resolución'
-        hdr_cells[3].text = 'Estado'
+        doc.add_heading('Resumen por Tipo de Resolución', level=1)
+        self._agregar_tabla(doc, ['Tipo'] + encabezados_desglose,
+                            ([tipo] + desglose(conteos) for tipo, conteos in sorted(por_tipo.items())))
         
-        # Datos
-        for file_info in generated_files:
-            row_cells = table.add_row().cells
-            row_cells[0].text = file_info['aprendiz']
-            row_cells[1].text = file_info['numero_documento']
-            row_cells[2].text = file_info['numero_resolucion']
-            row_cells[3].text = file_info['status'].upper()
+        doc.add_heading('Resumen por Ficha', level=1)
+        self._agregar_tabla(doc, ['Ficha'] + encabezados_desglose,
+                            ([ficha] + desglose(conteos) for ficha, conteos in sorted(por_ficha.items())))
+        
+        # Tabla de resultados
+        doc.add_heading('Detalle de Resoluciones', level=1)
+        self._agregar_tabla(doc, ['Aprendiz', 'Documento', 'No. Resolución', 'Estado', 'Tiempo (ms)'], (
+            [file_info['aprendiz'], file_info['numero_documento'], file_info['numero_resolucion'] or '',
+             file_info['status'].upper(), '' if file_info.get('duracion_ms') is None else file_info['duracion_ms']]
+            for file_info in generated_files
+        ))
         
         # Guardar resumen
         summary_filename = f"resumen_generacion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
-        summary_filepath = os.path.join(self.output_dir, summary_filename)
-        doc.save(summary_filepath)
+        summary_filepath = self._output_path(summary_filename, subdir)
+        self._save_atomic(doc, summary_filepath)
         
         return summary_filepath
-        
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""Exportación incremental del histórico de resoluciones a CSV o XLSX."""
+import csv
+import io
+
+EXPORT_COLUMNS = ['No. Resolución', 'Tipo', 'Fecha de generación', 'Estado', 'Tipo documento',
+                  'Número documento', 'Nombres', 'Apellidos', 'Programa', 'Ficha']
+
+# Filas que se acumulan antes de enviar un bloque CSV al cliente
+CSV_FLUSH_ROWS = 500
+
+
+def iter_csv(filas):
+    """Genera el CSV por bloques a medida que llegan las filas"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM para que Excel reconozca UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+
+    for numero, fila in enumerate(filas, 1):
+        writer.writerow(fila)
+        if numero % CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def write_xlsx(filas, filepath):
+    """Escribe un libro XLSX en modo write-only (las filas no se mantienen en memoria)"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Resoluciones')
+    sheet.append(EXPORT_COLUMNS)
+    for fila in filas:
+        sheet.append(list(fila))
+    workbook.save(filepath)
+    return filepath
@@ -0,0 +1,40 @@
+"""Caché LRU en memoria para archivos pequeños que se descargan repetidamente.
+
+La llave incluye la fecha de modificación y el tamaño, de modo que un archivo reescrito
+nunca se sirve desde una copia vieja.
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUFileCache:
+    def __init__(self, max_bytes, max_item_bytes):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, mtime_ns, size):
+        """Devuelve el contenido del archivo, leyéndolo del disco solo si no está en caché"""
+        if size > self.max_item_bytes:
+            return None
+
+        key = (path, mtime_ns, size)
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                return data
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = data
+                self._bytes += len(data)
+                while self._bytes > self.max_bytes and self._items:
+                    _, viejo = self._items.popitem(last=False)
+                    self._bytes -= len(viejo)
+        return data
@@ -0,0 +1,224 @@
+"""Prueba de carga: simula coordinadores concurrentes sobre las rutas reales.
+
+Cada sesión sube un listado sintético, valida, genera las resoluciones y descarga el ZIP
+(/upload -> /validate -> /generate -> /download-multiple). Al final se reporta por ruta:
+peticiones, errores, throughput y latencias p50/p95/p99.
+
+Contra un servidor en ejecución:
+    python loadtest.py --url http://localhost:5000 --sesiones 10 --filas 50
+
+En el mismo proceso (cliente de pruebas de Flask) con una base MySQL desechable, que se
+crea y migra antes de empezar (por defecto sena_bienestar_carga; nunca la base configurada):
+    python loadtest.py --en-proceso --sesiones 10
+"""
+import argparse
+import http.cookiejar
+import io
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from data_loader import normalize_roster
+from locks import generation_job_key
+
+TIPO_RESOLUCION = 'APOYO_SOSTENIMIENTO'
+
+
+def synthetic_roster(prefijo_documento, filas):
+    """Genera un listado CSV sintético con documentos únicos para la sesión"""
+    lineas = ['numero_documento,tipo_documento,nombres,apellidos,programa,ficha,email']
+    documentos = []
+    for i in range(filas):
+        documento = f"{prefijo_documento}{i:04d}"
+        documentos.append(documento)
+        lineas.append(f"{documento},CC,Aprendiz {i},Prueba Carga,Tecnología en Minería,{2500000 + i % 20},"
+                      f"aprendiz{i}@example.com")
+    return '\n'.join(lineas).encode('utf-8'), documentos
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class HttpClient:
+    """Cliente HTTP con cookies (una sesión de navegador) que no sigue redirecciones"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None, files=None):
+        headers = {}
+        body = None
+        if files:
+            body, content_type = self._multipart(data or {}, files)
+            headers['Content-Type'] = content_type
+        elif data is not None:
+            body = urllib.parse.urlencode(data, doseq=True).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(req) as respuesta:
+                respuesta.read()
+                return respuesta.status, respuesta.headers.get('Location', '')
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get('Location', '')
+
+    @staticmethod
+    def _multipart(campos, archivos):
+        limite = uuid.uuid4().hex
+        partes = []
+        for nombre, valor in campos.items():
+            partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode())
+        for nombre, (contenido, nombre_archivo) in archivos.items():
+            partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"; '
+                          f'filename="{nombre_archivo}"\r\nContent-Type: text/csv\r\n\r\n'.encode())
+            partes.append(contenido + b'\r\n')
+        partes.append(f'--{limite}--\r\n'.encode())
+        return b''.join(partes), f'multipart/form-data; boundary={limite}'
+
+
+class InProcessClient:
+    """Cliente de pruebas de Flask con la misma interfaz que HttpClient"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, files=None):
+        if files:
+            data = dict(data or {})
+            for nombre, (contenido, nombre_archivo) in files.items():
+                data[nombre] = (io.BytesIO(contenido), nombre_archivo)
+        respuesta = self.client.open(path, method=method, data=data)
+        respuesta.get_data()
+        respuesta.close()
+        return respuesta.status_code, respuesta.headers.get('Location', '')
+
+
+class Metrics:
+    """Latencias y errores por ruta, compartidos entre hilos"""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, ruta, segundos, ok):
+        with self._lock:
+            self.latencias[ruta].append(segundos)
+            if not ok:
+                self.errores[ruta] += 1
+
+    @staticmethod
+    def _percentil(valores, p):
+        ordenados = sorted(valores)
+        return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+    def report(self, duracion):
+        print(f"\n{'Ruta':<20}{'Peticiones':>11}{'Errores':>9}{'% error':>9}{'req/s':>9}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for ruta, valores in self.latencias.items():
+            errores = self.errores[ruta]
+            print(f"{ruta:<20}{len(valores):>11}{errores:>9}{errores / len(valores) * 100:>8.1f}%"
+                  f"{len(valores) / duracion:>9.2f}"
+                  f"{self._percentil(valores, 50) * 1000:>9.0f}"
+                  f"{self._percentil(valores, 95) * 1000:>9.0f}"
+                  f"{self._percentil(valores, 99) * 1000:>9.0f}")
+        total = sum(len(valores) for valores in self.latencias.values())
+        print(f"\nDuración: {duracion:.1f} s - {total} peticiones - {total / duracion:.2f} req/s")
+
+
+def run_session(client, metrics, sesion, iteraciones, filas, run_id, generated_folder):
+    """Ejecuta el flujo completo de un coordinador"""
+    for iteracion in range(iteraciones):
+        prefijo_documento = f"9{run_id}{sesion:03d}{iteracion:02d}"
+        contenido, documentos = synthetic_roster(prefijo_documento, filas)
+        prefijo = f"LT{run_id}-{sesion}-{iteracion}-"
+
+        def paso(ruta, esperado, method, path, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                status, location = client.request(method, path, **kwargs)
+                ok = status < 400 and (esperado is None or location.endswith(esperado))
+            except Exception:
+                ok = False
+            metrics.record(ruta, time.perf_counter() - inicio, ok)
+            return ok
+
+        if not paso('/upload', '/validate', 'POST', '/upload',
+                    data={'tipo_resolucion': TIPO_RESOLUCION},
+                    files={'file': (contenido, f'listado_{prefijo_documento}.csv')}):
+            continue
+        paso('/validate', None, 'GET', '/validate')
+
+        formulario = {'aprendices': documentos, 'numero_inicial': '1', 'prefijo': prefijo,
+                      'periodo': str(datetime.now().year), 'omitir_duplicados': '1'}
+        if not paso('/generate', '/results', 'POST', '/generate', data=formulario):
+            continue
+
+        # Las rutas de salida son deterministas: lote = clave idempotente del trabajo, calculada
+        # sobre el listado normalizado como lo hace el servidor
+        aprendices = normalize_roster(pd.read_csv(io.BytesIO(contenido), dtype=str))
+        lote_id = generation_job_key(TIPO_RESOLUCION, prefijo, 1, datetime.now().year, True, aprendices)
+        archivos = [os.path.join(generated_folder, lote_id, f"resolucion_{prefijo.replace('-', '_')}{i:05d}_{documento}.docx")
+                    for i, documento in enumerate(documentos, 1)]
+        paso('/download-multiple', None, 'POST', '/download-multiple', data={'files': archivos})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga del sistema de resoluciones')
+    parser.add_argument('--url', default='http://localhost:5000', help='URL del servidor a probar')
+    parser.add_argument('--en-proceso', action='store_true', help='Usar el cliente de pruebas de Flask')
+    parser.add_argument('--base-datos', default='sena_bienestar_carga',
+                        help='Base MySQL desechable para el modo en proceso')
+    parser.add_argument('--sesiones', type=int, default=5, help='Coordinadores concurrentes')
+    parser.add_argument('--iteraciones', type=int, default=2, help='Flujos completos por sesión')
+    parser.add_argument('--filas', type=int, default=20, help='Aprendices por listado')
+    parser.add_argument('--carpeta-generados', default='generated',
+                        help='Carpeta de generados del servidor (relativa a su directorio de trabajo)')
+    args = parser.parse_args()
+
+    run_id = datetime.now().strftime('%H%M%S')
+    metrics = Metrics()
+
+    if args.en_proceso:
+        from app import create_app, create_db_manager
+
+        app = create_app()
+        # Los datos sintéticos nunca se escriben en la base real de la aplicación
+        if args.base_datos == app.config['MYSQL_DATABASE']:
+            parser.error(f"--base-datos debe ser una base desechable, no la configurada ({args.base_datos})")
+        app.config['MYSQL_DATABASE'] = args.base_datos
+        create_db_manager(app).init_schema()
+        generated_folder = app.config['GENERATED_FOLDER']
+        clients = [InProcessClient(app) for _ in range(args.sesiones)]
+    else:
+        generated_folder = args.carpeta_generados
+        clients = [HttpClient(args.url) for _ in range(args.sesiones)]
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sesiones) as executor:
+        futuros = [executor.submit(run_session, client, metrics, sesion, args.iteraciones,
+                                   args.filas, run_id, generated_folder)
+                   for sesion, client in enumerate(clients)]
+        for futuro in futuros:
+            futuro.result()
+
+    metrics.report(time.perf_counter() - inicio)
+
+
+if __name__ == '__main__':
+    main()
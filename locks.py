@@ -0,0 +1,93 @@
+"""Bloqueos entre procesos para la generación por lotes.
+
+Con base de datos se usa el bloqueo consultivo de MySQL (GET_LOCK), válido entre todos
+los procesos y servidores que comparten la base; sin ella se usa un archivo de bloqueo
+creado de forma exclusiva en disco.
+"""
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+# Intervalo de espera entre intentos del bloqueo por archivo
+POLL_SECONDS = 0.5
+
+
+class LockTimeout(Exception):
+    """No se obtuvo el bloqueo dentro del tiempo de espera"""
+
+
+# Datos de cada aprendiz que se imprimen en su resolución
+JOB_KEY_FIELDS = ('numero_documento', 'tipo_documento', 'nombres', 'apellidos', 'programa', 'ficha')
+
+
+def generation_job_key(tipo_resolucion, prefijo, numero_inicial, periodo, omitir_duplicados, aprendices):
+    """Clave idempotente de un trabajo: la misma selección, numeración y datos producen la misma clave"""
+    partes = [tipo_resolucion, prefijo, str(numero_inicial), str(periodo), str(bool(omitir_duplicados))]
+    # Los datos de cada aprendiz, en su orden (que fija su número): si el listado se corrige y se
+    # vuelve a cargar, la clave cambia y no se reutilizan documentos con los datos anteriores
+    for aprendiz in aprendices:
+        partes.append('\x1f'.join(str(aprendiz.get(campo) or '') for campo in JOB_KEY_FIELDS))
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()[:32]
+
+
+@contextmanager
+def _mysql_lock(connection, nombre, timeout):
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT GET_LOCK(%s, %s)', (nombre, timeout))
+        if cursor.fetchone()[0] != 1:
+            raise LockTimeout(nombre)
+        try:
+            yield
+        finally:
+            cursor.execute('SELECT RELEASE_LOCK(%s)', (nombre,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        connection.close()
+
+
+@contextmanager
+def _file_lock(lock_folder, nombre, timeout, stale_after):
+    os.makedirs(lock_folder, exist_ok=True)
+    ruta = os.path.join(lock_folder, f"{nombre}.lock")
+    limite = time.monotonic() + timeout
+
+    while True:
+        try:
+            fd = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            # Un bloqueo abandonado por un proceso caído se descarta
+            try:
+                if time.time() - os.path.getmtime(ruta) > stale_after:
+                    os.remove(ruta)
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() >= limite:
+                raise LockTimeout(nombre)
+            time.sleep(POLL_SECONDS)
+
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+@contextmanager
+def batch_lock(nombre, db=None, lock_folder='locks', timeout=300, stale_after=3600):
+    """Bloqueo exclusivo de un lote entre procesos; lanza LockTimeout si no se obtiene a tiempo"""
+    connection = db.get_connection() if db else None
+    if connection:
+        with _mysql_lock(connection, nombre, timeout):
+            yield
+    else:
+        with _file_lock(lock_folder, nombre, timeout, stale_after):
+            yield
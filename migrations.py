@@ -0,0 +1,281 @@
+"""Migraciones versionadas del esquema MySQL.
+
+Cada migración tiene un número, una descripción y una lista de pasos. Un paso es
+una sentencia SQL o una función que recibe el cursor (para cambios condicionales
+como eliminar índices que pueden no existir). Las versiones aplicadas se registran
+en la tabla schema_migrations.
+"""
+import json
+
+from resolution_types import DEFAULT_TYPES
+
+
+def _index_exists(cursor, tabla, indice):
+    """Indica si un índice existe en una tabla de la base de datos actual"""
+    cursor.execute('''
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    ''', (tabla, indice))
+    return cursor.fetchone()[0] > 0
+
+
+def drop_index(tabla, indice):
+    """Paso de migración que elimina un índice solo si existe"""
+    def paso(cursor):
+        if _index_exists(cursor, tabla, indice):
+            cursor.execute(f'ALTER TABLE {tabla} DROP INDEX {indice}')
+    return paso
+
+
+def add_index(tabla, indice, columnas):
+    """Paso de migración que crea un índice solo si no existe"""
+    def paso(cursor):
+        if not _index_exists(cursor, tabla, indice):
+            cursor.execute(f'ALTER TABLE {tabla} ADD INDEX {indice} ({", ".join(columnas)})')
+    return paso
+
+
+def _column_exists(cursor, tabla, columna):
+    """Indica si una columna existe en una tabla de la base de datos actual"""
+    cursor.execute('''
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    ''', (tabla, columna))
+    return cursor.fetchone()[0] > 0
+
+
+def add_column(tabla, columna, definicion):
+    """Paso de migración que agrega una columna solo si no existe"""
+    def paso(cursor):
+        if not _column_exists(cursor, tabla, columna):
+            cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}')
+    return paso
+
+
+def _completar_tipos(cursor):
+    """Completa subtítulo y considerandos de las plantillas existentes de los tipos por defecto"""
+    for tipo in DEFAULT_TYPES:
+        cursor.execute('''
+            UPDATE plantillas SET subtitulo = %s, considerandos = %s
+            WHERE tipo = %s AND subtitulo IS NULL AND considerandos IS NULL
+        ''', (tipo['subtitulo'], json.dumps(tipo['considerandos'], ensure_ascii=False), tipo['tipo']))
+
+
+# Recalcula por completo la tabla estadisticas (migración 4 y comando refresh-stats)
+ESTADISTICAS_REBUILD = [
+    'DELETE FROM estadisticas',
+    '''
+    INSERT INTO estadisticas (dimension, clave, total)
+    SELECT 'tipo', tipo_resolucion, COUNT(*) FROM resoluciones GROUP BY tipo_resolucion
+    ''',
+    '''
+    INSERT INTO estadisticas (dimension, clave, total)
+    SELECT 'mes', DATE_FORMAT(fecha_generacion, '%Y-%m'), COUNT(*) FROM resoluciones
+    GROUP BY DATE_FORMAT(fecha_generacion, '%Y-%m')
+    ''',
+    '''
+    INSERT INTO estadisticas (dimension, clave, total)
+    SELECT 'programa', a.programa, COUNT(*) FROM resoluciones r JOIN aprendices a ON a.id = r.aprendiz_id
+    GROUP BY a.programa
+    ''',
+    '''
+    INSERT INTO estadisticas (dimension, clave, total)
+    SELECT 'ficha', a.ficha, COUNT(*) FROM resoluciones r JOIN aprendices a ON a.id = r.aprendiz_id
+    GROUP BY a.ficha
+    ''',
+    '''
+    INSERT INTO estadisticas (dimension, clave, total)
+    SELECT 'aprendices', 'total', COUNT(*) FROM aprendices
+    ''',
+    '''
+    INSERT INTO estadisticas (dimension, clave, total)
+    SELECT 'cargas', 'total', COUNT(*) FROM cargas_masivas
+    UNION ALL
+    SELECT 'cargas_estado', estado, COUNT(*) FROM cargas_masivas GROUP BY estado
+    UNION ALL
+    SELECT 'registros', 'exitosos', COALESCE(SUM(registros_exitosos), 0) FROM cargas_masivas
+    UNION ALL
+    SELECT 'registros', 'fallidos', COALESCE(SUM(registros_fallidos), 0) FROM cargas_masivas
+    ''',
+]
+
+MIGRATIONS = [
+    (1, 'Esquema inicial', [
+        '''
+        CREATE TABLE IF NOT EXISTS aprendices (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            numero_documento VARCHAR(20) UNIQUE NOT NULL,
+            tipo_documento VARCHAR(5) NOT NULL,
+            nombres VARCHAR(100) NOT NULL,
+            apellidos VARCHAR(100) NOT NULL,
+            programa VARCHAR(200) NOT NULL,
+            ficha VARCHAR(20) NOT NULL,
+            fecha_nacimiento DATE NULL,
+            telefono VARCHAR(20) NULL,
+            email VARCHAR(100) NULL,
+            estado VARCHAR(20) DEFAULT 'ACTIVO',
+            fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_numero_documento (numero_documento),
+            INDEX idx_ficha (ficha),
+            INDEX idx_estado (estado)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS resoluciones (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            numero_resolucion VARCHAR(50) UNIQUE NOT NULL,
+            tipo_resolucion VARCHAR(50) NOT NULL,
+            aprendiz_id INT NOT NULL,
+            contenido TEXT NOT NULL,
+            fecha_generacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            estado VARCHAR(20) DEFAULT 'GENERADA',
+            archivo_path VARCHAR(500) NULL,
+            usuario_creacion VARCHAR(100) NULL,
+            observaciones TEXT NULL,
+            FOREIGN KEY (aprendiz_id) REFERENCES aprendices (id) ON DELETE CASCADE,
+            INDEX idx_numero_resolucion (numero_resolucion),
+            INDEX idx_tipo_resolucion (tipo_resolucion),
+            INDEX idx_fecha_generacion (fecha_generacion)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS plantillas (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(200) NOT NULL,
+            tipo VARCHAR(50) NOT NULL,
+            descripcion TEXT NULL,
+            contenido TEXT NOT NULL,
+            variables TEXT NULL,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            activa BOOLEAN DEFAULT TRUE,
+            usuario_creacion VARCHAR(100) NULL,
+            INDEX idx_tipo (tipo),
+            INDEX idx_activa (activa)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS cargas_masivas (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre_archivo VARCHAR(255) NOT NULL,
+            tipo_resolucion VARCHAR(50) NOT NULL,
+            total_registros INT NOT NULL,
+            registros_exitosos INT DEFAULT 0,
+            registros_fallidos INT DEFAULT 0,
+            fecha_carga TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            usuario_carga VARCHAR(100) NULL,
+            estado VARCHAR(20) DEFAULT 'PROCESANDO',
+            observaciones TEXT NULL,
+            INDEX idx_tipo_resolucion (tipo_resolucion),
+            INDEX idx_fecha_carga (fecha_carga),
+            INDEX idx_estado (estado)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        ''',
+    ]),
+    (2, 'Índices compuestos y eliminación de índices redundantes', [
+        # Duplican las llaves UNIQUE de numero_documento y numero_resolucion
+        drop_index('aprendices', 'idx_numero_documento'),
+        drop_index('resoluciones', 'idx_numero_resolucion'),
+        # Cubre la llave foránea aprendiz_id (MySQL descarta el índice implícito)
+        add_index('resoluciones', 'idx_aprendiz_tipo_fecha', ['aprendiz_id', 'tipo_resolucion', 'fecha_generacion']),
+        # Consulta de plantillas activas por tipo
+        add_index('plantillas', 'idx_tipo_activa', ['tipo', 'activa']),
+        drop_index('plantillas', 'idx_tipo'),
+        drop_index('plantillas', 'idx_activa'),
+    ]),
+    (3, 'Registro de archivos generados para retención', [
+        '''
+        CREATE TABLE IF NOT EXISTS archivos_generados (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            ruta VARCHAR(500) NOT NULL,
+            lote VARCHAR(64) NULL,
+            categoria VARCHAR(20) NOT NULL,
+            tamano BIGINT NOT NULL DEFAULT 0,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uk_ruta (ruta),
+            INDEX idx_fecha_creacion (fecha_creacion)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        ''',
+    ]),
+    (4, 'Estadísticas agregadas para el tablero', [
+        '''
+        CREATE TABLE IF NOT EXISTS estadisticas (
+            dimension VARCHAR(20) NOT NULL,
+            clave VARCHAR(200) NOT NULL,
+            total BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, clave)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        ''',
+        # Carga inicial a partir de los datos existentes
+        *ESTADISTICAS_REBUILD,
+    ]),
+    (5, 'Almacenamiento de documentos en la base de datos', [
+        '''
+        CREATE TABLE IF NOT EXISTS documentos (
+            clave VARCHAR(500) NOT NULL PRIMARY KEY,
+            tamano BIGINT NOT NULL,
+            partes INT NOT NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS documentos_blob (
+            clave VARCHAR(500) NOT NULL,
+            parte INT NOT NULL,
+            datos LONGBLOB NOT NULL,
+            PRIMARY KEY (clave, parte)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        ''',
+    ]),
+    (6, 'Subtítulo y considerandos de cada tipo de resolución en plantillas', [
+        add_column('plantillas', 'subtitulo', 'VARCHAR(500) NULL AFTER descripcion'),
+        add_column('plantillas', 'considerandos', 'TEXT NULL AFTER subtitulo'),
+        _completar_tipos,
+    ]),
+]
+
+
+def ensure_version_table(cursor):
+    """Crea la tabla de control de versiones del esquema"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            descripcion VARCHAR(200) NOT NULL,
+            fecha_aplicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+
+
+def applied_versions(cursor):
+    """Obtiene las versiones de migración ya aplicadas"""
+    cursor.execute('SELECT version FROM schema_migrations')
+    return {row[0] for row in cursor.fetchall()}
+
+
+def apply_migrations(connection):
+    """Aplica en orden las migraciones pendientes y devuelve los números aplicados"""
+    cursor = connection.cursor()
+    aplicadas = []
+
+    try:
+        ensure_version_table(cursor)
+        existentes = applied_versions(cursor)
+
+        for version, descripcion, pasos in MIGRATIONS:
+            if version in existentes:
+                continue
+
+            for paso in pasos:
+                if callable(paso):
+                    paso(cursor)
+                else:
+                    cursor.execute(paso)
+
+            cursor.execute('INSERT INTO schema_migrations (version, descripcion) VALUES (%s, %s)',
+                           (version, descripcion))
+            connection.commit()
+            aplicadas.append(version)
+    finally:
+        cursor.close()
+
+    return aplicadas
@@ -0,0 +1,154 @@
+"""Definiciones de los tipos de resolución.
+
+Cada tipo define su subtítulo, sus considerandos propios y sus artículos (el contenido de
+la plantilla). Las definiciones se guardan en la tabla plantillas: DEFAULT_TYPES se inserta
+al crear la base y la migración 6 lo completa en bases existentes. En ejecución cada tipo
+se lee de la base una sola vez por proceso y sus textos se precompilan, de modo que un tipo
+nuevo solo requiere insertar su plantilla.
+"""
+import json
+import re
+import threading
+
+# Considerandos comunes a todos los tipos, antes de los propios de cada uno
+CONSIDERANDOS_BASE = [
+    'Que el artículo 6º del Decreto 2375 de 1974 establece la creación del Fondo Nacional de Formación Profesional de la Industria de la Construcción.',
+    'Que el SENA tiene la responsabilidad de administrar los recursos destinados al bienestar de los aprendices.',
+    'Que es necesario garantizar el apoyo a los aprendices durante su proceso de formación.'
+]
+
+DEFAULT_TYPES = [
+    {
+        'nombre': 'Resolución de Apoyo de Sostenimiento FIC',
+        'tipo': 'APOYO_SOSTENIMIENTO',
+        'descripcion': 'Resolución para otorgar apoyo de sostenimiento del Fondo de la Industria de la Construcción',
+        'subtitulo': 'Por la cual se otorga apoyo de sostenimiento al aprendiz {nombres} {apellidos}',
+        'considerandos': [
+            'Que el aprendiz cumple con los requisitos establecidos para el otorgamiento del apoyo de sostenimiento.',
+            'Que existe disponibilidad presupuestal para atender la solicitud.'
+        ],
+        'contenido': '''ARTÍCULO 1°: Otorgar apoyo de sostenimiento FIC al aprendiz {nombres} {apellidos}, identificado con {tipo_documento} No. {numero_documento}, quien se encuentra matriculado en el programa de formación {programa}, ficha {ficha}, del Centro Minero SENA Regional Boyacá.
+
+ARTÍCULO 2°: El presente apoyo se otorga por el período académico correspondiente al programa de formación matriculado, de conformidad con la normatividad vigente y los recursos presupuestales disponibles.
+
+ARTÍCULO 3°: La presente resolución rige a partir de la fecha de su expedición.''',
+        'variables': 'numero_resolucion,nombres,apellidos,tipo_documento,numero_documento,programa,ficha,ciudad,dia,mes,año'
+    },
+    {
+        'nombre': 'Resolución de Apoyo de Transporte',
+        'tipo': 'TRANSPORTE',
+        'descripcion': 'Resolución para otorgar apoyo de transporte a aprendices',
+        'subtitulo': 'Por la cual se otorga apoyo de transporte al aprendiz {nombres} {apellidos}',
+        'considerandos': [
+            'Que se requiere facilitar el desplazamiento del aprendiz hacia el centro de formación.',
+            'Que el apoyo de transporte contribuye a la permanencia en el programa formativo.'
+        ],
+        'contenido': '''ARTÍCULO 1°: Otorgar apoyo de transporte al aprendiz {nombres} {apellidos}, identificado con {tipo_documento} No. {numero_documento}, matriculado en el programa {programa}, ficha {ficha}.
+
+ARTÍCULO 2°: El apoyo se otorga para facilitar el desplazamiento desde su lugar de residencia hasta el Centro de Formación y viceversa, durante el período de formación.
+
+ARTÍCULO 3°: La presente resolución rige a partir de la fecha de su expedición.''',
+        'variables': 'numero_resolucion,nombres,apellidos,tipo_documento,numero_documento,programa,ficha'
+    },
+    {
+        'nombre': 'Resolución de Monitoria Académica',
+        'tipo': 'MONITORIA',
+        'descripcion': 'Resolución para designar monitores académicos por excelencia',
+        'subtitulo': 'Por la cual se designa como monitor académico al aprendiz {nombres} {apellidos}',
+        'considerandos': [
+            'Que el aprendiz ha demostrado excelencia académica y competencias para ejercer monitoria.',
+            'Que la monitoria académica fortalece el proceso de formación integral.'
+        ],
+        'contenido': '''ARTÍCULO 1°: Designar como monitor académico al aprendiz {nombres} {apellidos}, identificado con {tipo_documento} No. {numero_documento}, del programa {programa}, ficha {ficha}.
+
+ARTÍCULO 2°: Las actividades de monitoria se desarrollarán bajo la supervisión del Coordinador Académico y tendrán una duración de cuatro (4) meses.
+
+ARTÍCULO 3°: El monitor recibirá un estímulo económico mensual equivalente al 50% del salario mínimo legal vigente.
+
+ARTÍCULO 4°: La presente resolución rige a partir de la fecha de su expedición.''',
+        'variables': 'numero_resolucion,nombres,apellidos,tipo_documento,numero_documento,programa,ficha'
+    }
+]
+
+_VARIABLE = re.compile(r'\{(\w+)\}')
+
+
+class Texto:
+    """Texto con variables {nombre}, dividido una sola vez en partes fijas y variables"""
+    __slots__ = ('partes',)
+
+    def __init__(self, texto):
+        # re.split con grupo alterna texto fijo (posiciones pares) y nombres de variable
+        self.partes = tuple(_VARIABLE.split(texto))
+
+    def render(self, datos):
+        return ''.join(parte if i % 2 == 0 else str(datos.get(parte, f'{{{parte}}}'))
+                       for i, parte in enumerate(self.partes))
+
+
+def split_articulos(contenido):
+    """Divide el contenido de la plantilla en artículos (encabezado en negrita, cuerpo)"""
+    articulos = []
+    for i, articulo in enumerate(contenido.split('ARTÍCULO')):
+        if not articulo.strip():
+            continue
+        texto = ('ARTÍCULO ' if i == 0 else 'ARTÍCULO') + articulo.strip()
+        if ':' in texto:
+            encabezado, cuerpo = texto.split(':', 1)
+            articulos.append((encabezado + ':', Texto(cuerpo.strip())))
+        else:
+            articulos.append((None, Texto(texto)))
+    return articulos
+
+
+class ResolutionType:
+    """Contenido estático de un tipo de resolución, precompilado para generar muchos documentos"""
+    __slots__ = ('tipo', 'nombre', 'contenido', 'subtitulo', 'considerandos', 'articulos')
+
+    def __init__(self, tipo, nombre='', descripcion='', subtitulo=None, considerandos=(), contenido=''):
+        self.tipo = tipo
+        self.nombre = nombre
+        self.contenido = contenido
+        self.subtitulo = Texto(subtitulo or descripcion or 'Resolución administrativa')
+        self.considerandos = tuple(CONSIDERANDOS_BASE) + tuple(considerandos)
+        self.articulos = split_articulos(contenido)
+
+    @classmethod
+    def from_plantilla(cls, plantilla):
+        """Construye el tipo a partir de una fila de plantillas (considerandos en JSON)"""
+        considerandos = plantilla.get('considerandos') or []
+        if isinstance(considerandos, str):
+            considerandos = json.loads(considerandos)
+        return cls(plantilla['tipo'], nombre=plantilla.get('nombre', ''),
+                   descripcion=plantilla.get('descripcion') or '',
+                   subtitulo=plantilla.get('subtitulo'), considerandos=considerandos,
+                   contenido=plantilla['contenido'])
+
+
+class ResolutionRegistry:
+    """Tipos de resolución leídos de la tabla plantillas una vez por proceso"""
+
+    def __init__(self, db_factory):
+        self.db_factory = db_factory
+        self._tipos = {}
+        self._lock = threading.Lock()
+
+    def get(self, tipo):
+        """Devuelve el tipo de resolución o None si no hay plantilla activa para él"""
+        with self._lock:
+            if tipo in self._tipos:
+                return self._tipos[tipo]
+
+        db = self.db_factory()
+        plantilla = db.get_plantilla(tipo) if db else None
+        if not plantilla:
+            return None
+
+        definicion = ResolutionType.from_plantilla(plantilla)
+        with self._lock:
+            return self._tipos.setdefault(tipo, definicion)
+
+    def clear(self):
+        """Descarta las definiciones en memoria (tras modificar plantillas)"""
+        with self._lock:
+            self._tipos.clear()
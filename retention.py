@@ -0,0 +1,125 @@
+"""Retención de archivos generados y cargados.
+
+Los archivos registrados en la tabla archivos_generados se eliminan cuando superan la
+edad máxima o cuando el espacio total supera la cuota (primero los más antiguos). Además
+se recorre el disco para eliminar por edad los archivos no registrados (lotes en tránsito,
+ZIP huérfanos) y los subdirectorios de lote que quedan vacíos.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def remove_file(ruta):
+    """Elimina un archivo ignorando los que ya no existen"""
+    try:
+        os.remove(ruta)
+        return True
+    except FileNotFoundError:
+        return True
+    except OSError as e:
+        logger.error("No se pudo eliminar %s: %s", ruta, e)
+        return False
+
+
+class RetentionManager:
+    def __init__(self, folders, max_age_days, max_bytes, db_factory=None):
+        self.folders = folders
+        self.max_age = timedelta(days=max_age_days)
+        self.max_bytes = max_bytes
+        self.db_factory = db_factory
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _scan(self):
+        """Lista (fecha de modificación, tamaño, ruta) de todos los archivos de las carpetas"""
+        archivos = []
+        for folder in self.folders:
+            for raiz, _, nombres in os.walk(folder):
+                for nombre in nombres:
+                    ruta = os.path.join(raiz, nombre)
+                    try:
+                        stat = os.stat(ruta)
+                    except OSError:
+                        continue
+                    archivos.append((stat.st_mtime, stat.st_size, ruta))
+        return archivos
+
+    def _remove_empty_dirs(self):
+        """Elimina los subdirectorios de lote vacíos"""
+        for folder in self.folders:
+            for raiz, directorios, nombres in os.walk(folder, topdown=False):
+                if raiz != folder and not directorios and not nombres:
+                    try:
+                        os.rmdir(raiz)
+                    except OSError:
+                        pass
+
+    def _evict_tracked(self, db):
+        """Elimina los archivos registrados vencidos o que exceden la cuota"""
+        eliminados = 0
+        anteriores = None
+        while True:
+            rutas = db.get_archivos_para_eliminar(datetime.now() - self.max_age, self.max_bytes)
+            # Sin avance (la consulta devuelve las mismas rutas) se termina la pasada
+            if not rutas or rutas == anteriores:
+                return eliminados
+            anteriores = rutas
+            borradas = [ruta for ruta in rutas if remove_file(ruta)]
+            eliminados += len(borradas)
+            # Si no se pudo quitar el registro, la siguiente consulta devolvería las mismas rutas
+            if not db.delete_archivos(borradas) or len(borradas) < len(rutas):
+                return eliminados
+
+    def _evict_untracked(self, con_cuota):
+        """Elimina por edad (y por cuota si no hay base de datos) recorriendo el disco"""
+        limite = time.time() - self.max_age.total_seconds()
+        archivos = sorted(self._scan())
+        total = sum(tamano for _, tamano, _ in archivos)
+        eliminados = 0
+
+        for mtime, tamano, ruta in archivos:
+            vencido = mtime < limite
+            excede = con_cuota and total > self.max_bytes
+            if not (vencido or excede):
+                if not con_cuota:
+                    break
+                continue
+            if remove_file(ruta):
+                total -= tamano
+                eliminados += 1
+        return eliminados
+
+    def evict(self):
+        """Ejecuta una pasada de limpieza y devuelve el número de archivos eliminados"""
+        db = self.db_factory() if self.db_factory else None
+        eliminados = 0
+        if db:
+            eliminados += self._evict_tracked(db)
+        eliminados += self._evict_untracked(con_cuota=db is None)
+        self._remove_empty_dirs()
+        return eliminados
+
+    def start(self, interval):
+        """Inicia la limpieza periódica en un hilo en segundo plano"""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    eliminados = self.evict()
+                    if eliminados:
+                        logger.info("Retención: %s archivos eliminados", eliminados)
+                except Exception as e:
+                    logger.error("Error en la limpieza de archivos: %s", e)
+
+        self._thread = threading.Thread(target=loop, name='retencion-archivos', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,214 @@
+"""Almacenamiento de documentos generados.
+
+Los documentos se generan en la carpeta de trabajo local y se publican en el backend
+configurado con STORAGE_BACKEND; resoluciones.archivo_path guarda la llave del documento
+(ruta relativa '<lote>/<archivo>.docx'), no una ruta del servidor que lo generó.
+
+- local: la carpeta STORAGE_LOCAL_FOLDER (la llave es la ruta relativa dentro de ella). Es
+  distinta de la carpeta de generados, que la retención vacía por edad y cuota: la copia
+  publicada es la permanente.
+- mysql: tabla documentos_blob, en partes de BLOB_CHUNK_SIZE bytes.
+- s3: cualquier servicio compatible con S3 (AWS, MinIO); requiere boto3.
+"""
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+# Tamaño de lectura y de cada parte almacenada
+CHUNK_SIZE = 1024 * 1024
+
+
+class Storage(ABC):
+    """Interfaz común de los backends de almacenamiento"""
+
+    @abstractmethod
+    def save(self, key, source_path):
+        """Guarda el archivo local source_path bajo la llave indicada"""
+
+    @abstractmethod
+    def open(self, key, chunk_size=CHUNK_SIZE):
+        """Itera el contenido del documento por partes"""
+
+    @abstractmethod
+    def stat(self, key):
+        """Devuelve (tamaño, fecha de modificación en segundos) o None si no existe"""
+
+    @abstractmethod
+    def delete(self, key):
+        """Elimina el documento; no falla si no existe"""
+
+    def local_path(self, key):
+        """Ruta local del documento si el backend la tiene (permite enviarlo directamente)"""
+        return None
+
+    def save_many(self, items, max_workers=4):
+        """Publica en paralelo una lista de (llave, ruta local); devuelve por elemento None o el error ocurrido"""
+        def guardar(item):
+            try:
+                self.save(*item)
+            except Exception as e:
+                return e
+            return None
+
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(guardar, items))
+
+
+class LocalStorage(Storage):
+    def __init__(self, root, legacy_root=None):
+        self.root = os.path.abspath(root)
+        # Carpeta donde se publicaban los documentos antes (la de generados); solo se lee
+        self.legacy_root = os.path.abspath(legacy_root) if legacy_root else None
+
+    @staticmethod
+    def _join(root, key):
+        ruta = os.path.abspath(os.path.join(root, key))
+        if os.path.commonpath([ruta, root]) != root:
+            raise ValueError(f"Llave fuera del almacenamiento: {key}")
+        return ruta
+
+    def _path(self, key):
+        return self._join(self.root, key)
+
+    def save(self, key, source_path):
+        destino = self._path(key)
+        if os.path.abspath(source_path) == destino:
+            return key
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # Enlace duro si la carpeta está en el mismo disco (sin copiar el contenido); el
+        # reemplazo es atómico para que un reintento no deje el documento a medio escribir
+        temporal = f"{destino}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(source_path, temporal)
+        except OSError:
+            shutil.copyfile(source_path, temporal)
+        os.replace(temporal, destino)
+        return key
+
+    def local_path(self, key):
+        # Registros anteriores guardaban la ruta completa del archivo
+        if os.path.isabs(key) and os.path.isfile(key):
+            return key
+        for root in (self.root, self.legacy_root):
+            if root:
+                ruta = self._join(root, key)
+                if os.path.isfile(ruta):
+                    return ruta
+        return None
+
+    def open(self, key, chunk_size=CHUNK_SIZE):
+        ruta = self.local_path(key)
+        if ruta is None:
+            raise FileNotFoundError(key)
+        with open(ruta, 'rb') as f:
+            while True:
+                parte = f.read(chunk_size)
+                if not parte:
+                    break
+                yield parte
+
+    def stat(self, key):
+        ruta = self.local_path(key)
+        if not ruta:
+            return None
+        stat = os.stat(ruta)
+        return stat.st_size, stat.st_mtime
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class MySQLBlobStorage(Storage):
+    def __init__(self, db_factory, chunk_size=CHUNK_SIZE):
+        self.db_factory = db_factory
+        self.chunk_size = chunk_size
+
+    def _db(self):
+        db = self.db_factory()
+        if not db:
+            raise RuntimeError('El almacenamiento en MySQL requiere conexión a la base de datos')
+        return db
+
+    def save(self, key, source_path):
+        def partes():
+            with open(source_path, 'rb') as f:
+                while True:
+                    parte = f.read(self.chunk_size)
+                    if not parte:
+                        break
+                    yield parte
+
+        if not self._db().save_blob(key, partes()):
+            raise RuntimeError(f"No se pudo guardar el documento {key}")
+        return key
+
+    def open(self, key, chunk_size=CHUNK_SIZE):
+        # Las partes ya tienen el tamaño con que se guardaron
+        return self._db().iter_blob(key)
+
+    def stat(self, key):
+        return self._db().get_blob_stat(key)
+
+    def delete(self, key):
+        self._db().delete_blob(key)
+
+
+class S3Storage(Storage):
+    def __init__(self, bucket, endpoint_url=None, access_key=None, secret_key=None, region=None, prefix=''):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError('El almacenamiento S3 requiere boto3 (pip install boto3)')
+
+        # boto3 es seguro entre hilos a nivel de cliente, lo que permite save_many en paralelo
+        self.client = boto3.client('s3', endpoint_url=endpoint_url or None,
+                                   aws_access_key_id=access_key or None,
+                                   aws_secret_access_key=secret_key or None,
+                                   region_name=region or None)
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _object(self, key):
+        return f"{self.prefix}{key}"
+
+    def save(self, key, source_path):
+        self.client.upload_file(source_path, self.bucket, self._object(key))
+        return key
+
+    def open(self, key, chunk_size=CHUNK_SIZE):
+        respuesta = self.client.get_object(Bucket=self.bucket, Key=self._object(key))
+        try:
+            yield from respuesta['Body'].iter_chunks(chunk_size)
+        finally:
+            respuesta['Body'].close()
+
+    def stat(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            cabecera = self.client.head_object(Bucket=self.bucket, Key=self._object(key))
+        except ClientError:
+            return None
+        return cabecera['ContentLength'], cabecera['LastModified'].timestamp()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object(key))
+
+
+def create_storage(app_config, db_factory):
+    """Crea el backend de almacenamiento configurado en STORAGE_BACKEND"""
+    backend = app_config['STORAGE_BACKEND']
+    if backend == 'mysql':
+        return MySQLBlobStorage(db_factory)
+    if backend == 's3':
+        return S3Storage(app_config['S3_BUCKET'], endpoint_url=app_config['S3_ENDPOINT_URL'],
+                         access_key=app_config['S3_ACCESS_KEY'], secret_key=app_config['S3_SECRET_KEY'],
+                         region=app_config['S3_REGION'], prefix=app_config['S3_PREFIX'])
+    return LocalStorage(app_config['STORAGE_LOCAL_FOLDER'], legacy_root=app_config['GENERATED_FOLDER'])
@@ -0,0 +1,136 @@
+"""Registro estructurado (JSON por línea) con identificador de correlación por lote.
+
+Los módulos registran con logging.getLogger(__name__). configure_logging coloca una
+QueueHandler en el logger raíz: quien registra solo encola el evento y un hilo
+(QueueListener) lo formatea y lo escribe, de modo que el costo en los ciclos por fila es
+mínimo. Cada evento lleva el correlation_id del contexto activo (una carga o un lote de
+generación, ver correlation()).
+
+Los eventos por fila se marcan con extra={'evento': ...}; dentro de un mismo lote se
+registran los primeros sample_first de cada evento y luego uno de cada sample_every, y al
+cerrar el lote se registra cuántos se omitieron.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+correlation_id = ContextVar('correlation_id', default=None)
+
+# Atributos propios de LogRecord: el resto son campos adicionales (extra=...) del evento
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+logger = logging.getLogger(__name__)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada evento como un objeto JSON en una línea"""
+
+    def format(self, record):
+        evento = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _RECORD_ATTRS and valor is not None:
+                evento[clave] = valor
+        if record.exc_info:
+            evento['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Agrega el correlation_id y muestrea los eventos por fila de cada lote"""
+
+    def __init__(self, sample_first=20, sample_every=100):
+        super().__init__()
+        self.sample_first = sample_first
+        self.sample_every = sample_every
+        self._conteos = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        evento = getattr(record, 'evento', None)
+        if evento is None or record.correlation_id is None:
+            return True
+
+        with self._lock:
+            clave = (record.correlation_id, evento)
+            n = self._conteos.get(clave, 0) + 1
+            self._conteos[clave] = n
+        if n <= self.sample_first:
+            return True
+        if (n - self.sample_first) % self.sample_every == 0:
+            record.ocurrencias = n
+            return True
+        return False
+
+    def release(self, correlacion):
+        """Olvida los conteos de un lote terminado y devuelve {evento: total}"""
+        with self._lock:
+            claves = [clave for clave in self._conteos if clave[0] == correlacion]
+            return {clave[1]: self._conteos.pop(clave) for clave in claves}
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Se resuelven el mensaje y la excepción antes de cruzar al hilo escritor
+        record = copy.copy(record)
+        if record.exc_info:
+            record.excepcion = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+
+_context_filter = None
+_listener = None
+
+
+def configure_logging(level='INFO', sample_first=20, sample_every=100, stream=None):
+    """Configura el registro asíncrono en JSON para toda la aplicación (una vez por proceso)"""
+    global _context_filter, _listener
+    if _listener is not None:
+        return
+
+    salida = logging.StreamHandler(stream or sys.stdout)
+    salida.setFormatter(JsonFormatter())
+
+    cola = queue.SimpleQueue()
+    encolador = _QueueHandler(cola)
+    _context_filter = ContextFilter(sample_first, sample_every)
+    encolador.addFilter(_context_filter)
+
+    raiz = logging.getLogger()
+    raiz.addHandler(encolador)
+    raiz.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+    # Al terminar el proceso se escriben los eventos que queden en la cola
+    atexit.register(_listener.stop)
+
+
+@contextmanager
+def correlation(identificador):
+    """Asocia los eventos registrados dentro del bloque a una carga o lote"""
+    token = correlation_id.set(identificador)
+    try:
+        yield identificador
+    finally:
+        totales = _context_filter.release(identificador) if _context_filter else {}
+        if any(total > _context_filter.sample_first for total in totales.values()):
+            logger.warning('Eventos por fila muestreados', extra={'totales': totales})
+        correlation_id.reset(token)
@@ -0,0 +1,156 @@
+"""Límites de tamaño para los listados cargados, verificados antes de leerlos con pandas.
+
+El archivo se copia a disco por partes, cortando al superar el máximo de bytes. Luego se
+inspecciona sin cargarlo completo:
+
+- xlsx: el tamaño descomprimido del zip y la dimensión (<dimension ref="A1:L500">) de la
+  primera hoja; si la hoja no la declara se cuentan las filas leyendo el XML por partes.
+- csv: se cuentan las líneas por partes y las columnas del encabezado.
+- xls: el formato binario limita la hoja a 65.536 filas y 256 columnas; solo aplica el
+  máximo de bytes.
+"""
+import csv
+import io
+import posixpath
+import re
+import zipfile
+import zlib
+from xml.etree import ElementTree
+
+CHUNK_SIZE = 64 * 1024
+
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension\s+ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+_ROW = re.compile(rb'<(?:\w+:)?row[\s>]')
+_NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+class RosterTooLarge(ValueError):
+    """El archivo cargado supera los límites configurados"""
+
+
+def _mb(tamano):
+    return f'{tamano / (1024 * 1024):.1f} MB'
+
+
+def save_upload(file_storage, path, max_bytes):
+    """Copia el archivo recibido a disco por partes y aborta si supera max_bytes"""
+    total = 0
+    with open(path, 'wb') as destino:
+        while True:
+            parte = file_storage.stream.read(CHUNK_SIZE)
+            if not parte:
+                break
+            total += len(parte)
+            if total > max_bytes:
+                raise RosterTooLarge(f'El archivo supera el máximo de {_mb(max_bytes)}')
+            destino.write(parte)
+    return total
+
+
+def _column_number(letras):
+    numero = 0
+    for letra in letras:
+        numero = numero * 26 + ord(letra) - ord('A') + 1
+    return numero
+
+
+def _first_sheet(zf):
+    """Ruta dentro del zip de la primera hoja del libro (la que lee pandas por defecto)"""
+    libro = ElementTree.fromstring(zf.read('xl/workbook.xml'))
+    hoja = libro.find(f'{_NS_MAIN}sheets/{_NS_MAIN}sheet')
+    relaciones = ElementTree.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    for relacion in relaciones.iter(f'{_NS_PKG_REL}Relationship'):
+        if relacion.get('Id') == hoja.get(f'{_NS_REL}id'):
+            destino = relacion.get('Target')
+            return destino.lstrip('/') if destino.startswith('/') else posixpath.join('xl', destino)
+    raise ValueError('El libro no tiene hojas')
+
+
+def _sheet_dimensions(zf, ruta_hoja, max_rows):
+    """Lee la dimensión declarada de una hoja o cuenta sus filas"""
+    with zf.open(ruta_hoja) as hoja:
+        inicio = hoja.read(CHUNK_SIZE)
+        dimension = _DIMENSION.search(inicio)
+        if dimension:
+            _, _, columna_final, fila_final = dimension.groups()
+            if columna_final is None:
+                return 1, 1
+            return int(fila_final), _column_number(columna_final.decode())
+
+        # Sin dimensión declarada: se cuentan las filas y se corta al superar el máximo
+        filas = 0
+        resto = b''
+        parte = inicio
+        while parte:
+            bloque = resto + parte
+            filas += len(_ROW.findall(bloque))
+            if filas > max_rows + 1:
+                break
+            # Se conserva el final del bloque por si una etiqueta quedó partida
+            resto = bloque[-16:]
+            filas -= len(_ROW.findall(resto))
+            parte = hoja.read(CHUNK_SIZE)
+        return filas, None
+
+
+def _xlsx_dimensions(path, max_rows, max_uncompressed):
+    """Devuelve (filas, columnas) de la primera hoja; columnas es None si no se declara"""
+    try:
+        zf = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise ValueError('El archivo no es un libro de Excel válido')
+
+    with zf:
+        try:
+            ruta_hoja = _first_sheet(zf)
+        except (KeyError, AttributeError, ElementTree.ParseError):
+            raise ValueError('El archivo no es un libro de Excel válido')
+
+        descomprimido = sum(info.file_size for info in zf.infolist())
+        if descomprimido > max_uncompressed:
+            raise RosterTooLarge(f'El libro ocupa {_mb(descomprimido)} descomprimido (máximo {_mb(max_uncompressed)})')
+
+        try:
+            return _sheet_dimensions(zf, ruta_hoja, max_rows)
+        except (KeyError, zipfile.BadZipFile, zlib.error):
+            # La hoja referenciada no está en el zip o su contenido está dañado
+            raise ValueError('El archivo no es un libro de Excel válido')
+
+
+
+def _csv_dimensions(path, max_rows):
+    """Devuelve (filas, columnas) de un CSV contando las líneas por partes"""
+    with open(path, 'rb') as f:
+        encabezado = f.readline()
+        columnas = len(next(csv.reader(io.StringIO(encabezado.decode('utf-8-sig', errors='replace'))), []))
+        filas = encabezado.count(b'\n')
+        ultima = encabezado[-1:]
+        while filas <= max_rows + 1:
+            parte = f.read(CHUNK_SIZE)
+            if not parte:
+                break
+            filas += parte.count(b'\n')
+            ultima = parte[-1:]
+        # Última línea sin salto final
+        if ultima and ultima != b'\n':
+            filas += 1
+    return filas, columnas
+
+
+def inspect_roster(path, max_rows, max_columns, max_uncompressed):
+    """Verifica filas, columnas y tamaño descomprimido de un listado antes de leerlo"""
+    extension = path.rsplit('.', 1)[-1].lower()
+    if extension == 'xlsx':
+        filas, columnas = _xlsx_dimensions(path, max_rows, max_uncompressed)
+    elif extension == 'csv':
+        filas, columnas = _csv_dimensions(path, max_rows)
+    else:
+        return
+
+    # La primera fila es el encabezado
+    if filas - 1 > max_rows:
+        raise RosterTooLarge(f'El listado supera el máximo de {max_rows} filas')
+    if columnas is not None and columnas > max_columns:
+        raise RosterTooLarge(f'El listado tiene {columnas} columnas (máximo {max_columns})')